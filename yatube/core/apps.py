@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import metrics, slowlog, sqlite
+        metrics.instrument_templates()
+        connection_created.connect(sqlite.configure)
+        connection_created.connect(slowlog.install)
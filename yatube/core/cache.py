@@ -0,0 +1,214 @@
+"""Кеш в локальном файле SQLite, общий для всех процессов хоста.
+
+LocMemCache у каждого WSGI-воркера свой, и сброс версии кеша
+в одном процессе не виден остальным. Этот бэкенд хранит записи
+в одном файле SQLite (режим WAL), поэтому add/incr атомарны между
+процессами, а при превышении MAX_SIZE вытесняются давно
+не читавшиеся записи (LRU).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+"""
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_size (
+    total INTEGER NOT NULL,
+    entries INTEGER NOT NULL
+);
+INSERT INTO cache_size SELECT 0, 0
+    WHERE NOT EXISTS (SELECT 1 FROM cache_size);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_size SET total = total + NEW.size, entries = entries + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_size SET total = total - OLD.size, entries = entries - 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_size SET total = total - OLD.size + NEW.size;
+END;
+COMMIT;
+'''
+
+# Время последнего чтения обновляется не чаще раза в ACCESS_RESOLUTION
+# секунд, чтобы частые чтения не превращались в записи.
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._cull_ratio = float(options.get('CULL_RATIO', 0.9))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение у каждого потока свое; после fork открывается заново.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            db = sqlite3.connect(self._path, timeout=30,
+                                 isolation_level=None,
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, pid
+        return self._local.db
+
+    @staticmethod
+    def _encode(value):
+        # Целые числа хранятся как есть, чтобы incr выполнялся в SQL.
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now)
+            )
+            return default
+        if now - accessed > ACCESS_RESOLUTION:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return self._decode(value)
+
+    def _write(self, key, value, timeout, only_missing):
+        value = self._encode(value)
+        size = len(key) + (8 if isinstance(value, int) else len(value))
+        now = time.time()
+        sql = (
+            'INSERT INTO cache (key, value, expires, accessed, size) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed, size = excluded.size'
+        )
+        if only_missing:
+            sql += ' WHERE cache.expires IS NOT NULL AND cache.expires <= ?'
+        params = [key, value, self.get_backend_timeout(timeout), now, size]
+        if only_missing:
+            params.append(now)
+        written = self._db.execute(sql, params).rowcount == 1
+        if written:
+            self._evict()
+        return written
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(self._key(key, version), value, timeout, True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout, False)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            updated = db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                "AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, key, time.time())
+            ).rowcount
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        if not updated:
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            raise ValueError(f"Value of key '{key}' is not an integer")
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def size(self):
+        """Суммарный размер записей в байтах."""
+        return self._db.execute('SELECT total FROM cache_size').fetchone()[0]
+
+    def _evict(self):
+        if self.size() <= self._max_size:
+            return
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        target = self._max_size * self._cull_ratio
+        while True:
+            total, entries = db.execute(
+                'SELECT total, entries FROM cache_size'
+            ).fetchone()
+            if total <= target or not entries:
+                break
+            # Сколько записей среднего размера нужно удалить.
+            batch = math.ceil((total - target) * entries / total)
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)', (batch,)
+            )
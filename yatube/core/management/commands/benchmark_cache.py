@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость LocMemCache, FileBasedCache '
+            'и SQLiteCache на типичных операциях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--value-size', type=int, default=4096,
+                            help='Размер кешируемого фрагмента в байтах')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        # Все записи должны поместиться, чтобы сравнивать без вытеснения.
+        params = {'OPTIONS': {'MAX_ENTRIES': options['operations'] * 2}}
+        try:
+            backends = {
+                'locmem': LocMemCache('benchmark', params),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'), params
+                ),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), params
+                ),
+            }
+            self.stdout.write(
+                f'{"backend":<10} {"set/s":>10} {"get hit/s":>10} '
+                f'{"get miss/s":>10} {"incr/s":>10}'
+            )
+            for name, cache in backends.items():
+                rates = self.run(cache, options['operations'],
+                                 'x' * options['value_size'])
+                self.stdout.write(f'{name:<10} ' + ' '.join(
+                    f'{rate:>10.0f}' for rate in rates
+                ))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def run(cache, operations, value):
+        def rate(action):
+            started = time.perf_counter()
+            for i in range(operations):
+                action(i)
+            return operations / (time.perf_counter() - started)
+
+        cache.set('counter', 0)
+        return (
+            rate(lambda i: cache.set(f'key-{i}', value)),
+            rate(lambda i: cache.get(f'key-{i}')),
+            rate(lambda i: cache.get(f'missing-{i}')),
+            rate(lambda i: cache.incr('counter')),
+        )
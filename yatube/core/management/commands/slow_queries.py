@@ -0,0 +1,90 @@
+import json
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+ORDERS = {
+    'total': lambda stats: stats['total'],
+    'max': lambda stats: stats['max'],
+    'count': lambda stats: stats['count'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов: отпечатки с наибольшим '
+            'суммарным временем, откуда они приходят и их планы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--order', choices=list(ORDERS), default='total')
+        parser.add_argument('--since',
+                            help='Учитывать записи новее (ISO 8601)')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['log']):
+            raise CommandError(f'Журнал не найден: {options["log"]}')
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная дата: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        fingerprints = self.collect(options['log'], since)
+        worst = sorted(fingerprints.values(), key=ORDERS[options['order']],
+                       reverse=True)[:options['top']]
+        self.stdout.write(
+            f'Отпечатков: {len(fingerprints)}, запросов: '
+            f'{sum(stats["count"] for stats in fingerprints.values())}'
+        )
+        for stats in worst:
+            self.report(stats)
+
+    def collect(self, path, since):
+        fingerprints = {}
+        with open(path, encoding='utf-8') as log:
+            for line in log:
+                entry = json.loads(line)
+                if since is not None and parse_datetime(entry['time']) < since:
+                    continue
+                stats = fingerprints.setdefault(entry['fingerprint'], {
+                    'fingerprint': entry['fingerprint'], 'sql': entry['sql'],
+                    'count': 0, 'total': 0.0, 'max': 0.0, 'plan': None,
+                    'views': Counter(), 'sources': Counter(),
+                    'templates': Counter(),
+                })
+                stats['count'] += 1
+                stats['total'] += entry['duration']
+                stats['max'] = max(stats['max'], entry['duration'])
+                # Последний снятый план: он мог поменяться после миграции.
+                if entry.get('plan'):
+                    stats['plan'] = entry['plan']
+                stats['views'][entry['view']] += 1
+                stats['sources'][entry['source']] += 1
+                if entry['template']:
+                    stats['templates'][entry['template']] += 1
+        return fingerprints
+
+    def report(self, stats):
+        write = self.stdout.write
+        write('')
+        write(self.style.MIGRATE_HEADING(
+            f'{stats["fingerprint"]}: {stats["count"]} раз, всего '
+            f'{stats["total"]:.3f} с, в среднем '
+            f'{stats["total"] / stats["count"] * 1000:.1f} мс, '
+            f'максимум {stats["max"] * 1000:.1f} мс'
+        ))
+        write(f'  {stats["sql"]}')
+        for title, key in (('Представления', 'views'), ('Код', 'sources'),
+                           ('Шаблоны', 'templates')):
+            common = ', '.join(f'{name} ({count})'
+                               for name, count in stats[key].most_common(3))
+            if common:
+                write(f'  {title}: {common}')
+        for row in stats['plan'] or ():
+            write(f'  план: {row}')
@@ -0,0 +1,167 @@
+"""Метрики запросов в формате Prometheus.
+
+MetricsMiddleware для доли запросов METRICS_SAMPLE_RATE замеряет
+время ответа, число и время SQL-запросов, время рендеринга шаблонов
+и размер ответа и складывает их в гистограммы с меткой view —
+именем URL (posts:index, posts:post_detail, ...). Гистограммы живут
+в памяти процесса: при нескольких WSGI-воркерах каждый отдает свои,
+и суммирует их уже Prometheus. Страница /metrics/ доступна
+сотрудникам и по заголовку Authorization: Bearer <METRICS_TOKEN>.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.backends.django import Template
+
+_local = threading.local()
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (
+    1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024,
+    4 * 1024 * 1024,
+)
+
+
+class Histogram:
+    """Гистограмма с накопленными корзинами по значениям метки view."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, view, value):
+        # Вызывается под блокировкой реестра.
+        series = self.series.get(view)
+        if series is None:
+            series = self.series[view] = [0] * len(self.buckets) + [0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def expose(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        for view, series in sorted(self.series.items()):
+            label = 'view="{}"'.format(
+                view.replace('\\', '\\\\').replace('"', '\\"')
+            )
+            bounds = [*self.buckets, '+Inf']
+            for bound, count in zip(bounds, [*series[:-2], series[-1]]):
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} {count}'
+            yield f'{self.name}_sum{{{label}}} {series[-2]}'
+            yield f'{self.name}_count{{{label}}} {series[-1]}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram(
+            'yatube_request_duration_seconds',
+            'Время обработки запроса.', DURATION_BUCKETS)
+        self.queries = Histogram(
+            'yatube_request_db_queries',
+            'Число SQL-запросов на запрос.', QUERY_BUCKETS)
+        self.db_duration = Histogram(
+            'yatube_request_db_duration_seconds',
+            'Время SQL-запросов на запрос.', DURATION_BUCKETS)
+        self.render_duration = Histogram(
+            'yatube_request_render_duration_seconds',
+            'Время рендеринга шаблонов на запрос.', DURATION_BUCKETS)
+        self.response_size = Histogram(
+            'yatube_response_size_bytes',
+            'Размер тела ответа.', SIZE_BUCKETS)
+
+    @property
+    def histograms(self):
+        return (self.duration, self.queries, self.db_duration,
+                self.render_duration, self.response_size)
+
+    def record(self, view, sample, size):
+        with self.lock:
+            self.duration.observe(view, time.perf_counter() - sample.started)
+            self.queries.observe(view, sample.queries)
+            self.db_duration.observe(view, sample.db_time)
+            self.render_duration.observe(view, sample.render_time)
+            self.response_size.observe(view, size)
+
+    def expose(self):
+        with self.lock:
+            lines = [line for histogram in self.histograms
+                     for line in histogram.expose()]
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            for histogram in self.histograms:
+                histogram.series.clear()
+
+
+registry = Registry()
+
+
+class Sample:
+    """Замеры одного запроса; заодно обертка execute_wrapper."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @contextmanager
+    def active(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            _local.sample = self
+            try:
+                yield
+            finally:
+                _local.sample = None
+
+    def stream(self, content, view):
+        """Потоковый ответ замеряется до конца отдачи тела."""
+        size = 0
+        with self.active():
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        registry.record(view, self, size)
+
+
+def _timed_render(render):
+    def timed(self, context=None, request=None):
+        sample = getattr(_local, 'sample', None)
+        if sample is None:
+            return render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            sample.render_time += time.perf_counter() - started
+    timed.wrapped = render
+    return timed
+
+
+def instrument_templates():
+    """Добавляет замер времени в render() шаблонов Django. Вложенные
+    {% include %} рендерятся внутри и отдельно не учитываются."""
+    if not hasattr(Template.render, 'wrapped'):
+        Template.render = _timed_render(Template.render)
@@ -0,0 +1,71 @@
+import random
+
+from django.conf import settings
+
+from . import routers
+from .metrics import Sample, registry
+
+
+class MetricsMiddleware:
+    """Собирает метрики для доли запросов METRICS_SAMPLE_RATE.
+
+    Стоит первым в MIDDLEWARE, чтобы время включало остальные
+    middleware. При нулевой доле запрос проходит без замеров.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        sample = Sample()
+        with sample.active():
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if response.streaming:
+            response.streaming_content = sample.stream(
+                response.streaming_content, view
+            )
+        else:
+            registry.record(view, sample, len(response.content))
+        return response
+
+
+class ReplicaMiddleware:
+    """Направляет чтения GET/HEAD-запросов на реплику, см. core/routers.py.
+
+    После POST и других изменяющих запросов ставит cookie, с которой
+    следующие запросы пользователя читают из основной базы, пока
+    реплика могла не догнать его запись.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        if not routers.replica_configured():
+            return self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            response = self.get_response(request)
+            response.set_cookie(routers.REPLICA_PIN_COOKIE, '1',
+                                max_age=self.pin_seconds, httponly=True)
+            return response
+        if routers.REPLICA_PIN_COOKIE in request.COOKIES:
+            return self.get_response(request)
+        with routers.replica_reads():
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content
+            )
+        return response
+
+    def stream(self, content):
+        with routers.replica_reads():
+            yield from content
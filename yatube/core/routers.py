@@ -0,0 +1,55 @@
+"""Чтение с реплики, запись в основную базу.
+
+Реплика (алиас REPLICA в DATABASES) используется только внутри
+replica_reads(): ReplicaMiddleware включает его для GET/HEAD-запросов.
+Команды, сигналы и фоновые задачи читают из основной базы. Чтобы
+пользователь сразу видел свои изменения, запрос переходит на основную
+базу после первой записи и внутри транзакций, а после POST браузер
+получает cookie REPLICA_PIN_COOKIE, и его запросы REPLICA_PIN_SECONDS
+секунд тоже читают из основной базы.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+REPLICA_PIN_COOKIE = 'primary'
+
+_local = threading.local()
+
+
+def replica_configured():
+    return REPLICA in connections.databases
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_local, 'replica', False)
+    _local.replica = True
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not getattr(_local, 'replica', False) or not replica_configured()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос дочитывает из основной базы.
+        _local.replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -0,0 +1,128 @@
+"""Журнал медленных SQL-запросов.
+
+Обертка execute_wrapper ставится на каждое новое соединение с базой
+(сигнал connection_created) и пишет в SLOW_QUERY_LOG строку JSON
+для каждого запроса дольше SLOW_QUERY_THRESHOLD секунд: время,
+отпечаток, представление, строку кода и строку шаблона, откуда
+пришел запрос. Отпечаток — хеш SQL без литералов, так что запросы,
+отличающиеся только параметрами, считаются одним. План (EXPLAIN
+QUERY PLAN в SQLite, EXPLAIN в остальных базах) снимается один раз
+на отпечаток в процессе. Сводку строит команда slow_queries.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpRequest
+from django.template.base import Node
+from django.utils import timezone
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+_lock = threading.Lock()
+_explained = set()
+
+
+def normalize(sql):
+    """SQL без литералов и параметров; списки IN (...) сворачиваются."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def origin():
+    """Представление, строка кода проекта и строка шаблона,
+    из которых выполняется текущий запрос."""
+    view = source = template = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and node.token is not None:
+                template = f'{node.origin.template_name}:{node.token.lineno}'
+        if (source is None and filename.startswith(settings.BASE_DIR)
+                and filename != __file__):
+            source = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                      f'{frame.f_lineno} in {frame.f_code.co_name}')
+        request = frame.f_locals.get('request')
+        if view is None and isinstance(request, HttpRequest):
+            match = getattr(request, 'resolver_match', None)
+            if match is not None:
+                view = match.view_name
+        if view is not None and source is not None:
+            break
+        frame = frame.f_back
+    return view, source, template
+
+
+def explain(connection, sql, params):
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    try:
+        with connection.cursor() as cursor:
+            # Вызов мимо execute_wrappers, чтобы не замерять сам EXPLAIN.
+            cursor.cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError as error:
+        return [f'EXPLAIN не удался: {error}']
+    return [' '.join(str(value) for value in row) for row in rows]
+
+
+class SlowQueryRecorder:
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is not None and duration >= threshold:
+            self.record(context['connection'], sql, params, many, duration)
+        return result
+
+    def record(self, connection, sql, params, many, duration):
+        view, source, template = origin()
+        key = fingerprint(sql)
+        entry = {
+            'time': timezone.now().isoformat(),
+            'fingerprint': key,
+            'duration': round(duration, 6),
+            'sql': normalize(sql),
+            'view': view,
+            'source': source,
+            'template': template,
+        }
+        with _lock:
+            first = key not in _explained
+            _explained.add(key)
+        if first and not many and sql.lstrip()[:6].upper() == 'SELECT':
+            entry['plan'] = explain(connection, sql, params)
+        line = json.dumps(entry, ensure_ascii=False)
+        with _lock, open(settings.SLOW_QUERY_LOG, 'a',
+                         encoding='utf-8') as log:
+            log.write(line + '\n')
+
+
+recorder = SlowQueryRecorder()
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created. Объект соединения живет дольше
+    самого подключения, поэтому обертка добавляется один раз."""
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(recorder)
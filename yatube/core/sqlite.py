@@ -0,0 +1,18 @@
+"""Настройки соединений SQLite, которые задаются только PRAGMA.
+
+Применяются при каждом подключении (сигнал connection_created).
+Режим WAL хранится в самом файле базы, поэтому его включает
+соединение с основной базой; реплика открывается только
+на чтение (mode=ro) и получает остальные настройки.
+"""
+from django.conf import settings
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if 'mode=ro' in connection.settings_dict['NAME']:
+        pragmas.pop('journal_mode', None)
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_SIZE': 4096},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_values_are_missing(self):
+        """Просроченное значение не читается и может быть добавлено."""
+        self.cache.set('key', 'old', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr_is_shared_between_processes(self):
+        """incr атомарен для нескольких процессов."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=incr_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_keeps_size_bounded(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        self.cache.set('hot', 'x' * 100)
+        for i in range(100):
+            self.cache.set(f'cold-{i}', 'x' * 100)
+            self.cache._db.execute(
+                "UPDATE cache SET accessed = accessed + 10 "
+                "WHERE key LIKE '%hot'"
+            )
+
+        self.assertLessEqual(self.cache.size(), 4096)
+        self.assertEqual(self.cache.get('hot'), 'x' * 100)
+        self.assertIsNone(self.cache.get('cold-0'))
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        registry.clear()
+        self.guest_client = Client()
+
+    def scrape(self):
+        response = self.guest_client.get(reverse('metrics'),
+                                         HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_view(self):
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:api_index'))
+        # Потоковый ответ учитывается, когда тело отдано целиком.
+        b''.join(response.streaming_content)
+        metrics = self.scrape()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            metrics
+        )
+        self.assertIn(
+            'yatube_response_size_bytes_count{view="posts:api_index"} 1',
+            metrics
+        )
+        render_time = [
+            line for line in metrics.splitlines() if line.startswith(
+                'yatube_request_render_duration_seconds_sum'
+                '{view="posts:index"}'
+            )
+        ]
+        self.assertGreater(float(render_time[0].split()[-1]), 0)
+        self.assertNotIn(
+            'yatube_request_db_queries_bucket{view="posts:index",le="0"} 1',
+            metrics
+        )
+
+    def test_endpoint_is_protected(self):
+        self.assertEqual(
+            self.guest_client.get(reverse('metrics')).status_code, 403
+        )
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code, 403
+        )
+        self.guest_client.force_login(self.staff)
+        self.assertEqual(
+            self.guest_client.get(reverse('metrics')).status_code, 200
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_disabled_sampling_records_nothing(self):
+        Client().get(reverse('posts:index'))
+        self.assertNotIn('posts:index', self.scrape())
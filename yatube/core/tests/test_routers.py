@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core import routers
+from posts.models import Post
+
+User = get_user_model()
+
+
+@mock.patch('core.routers.replica_configured', return_value=True)
+class RouterTest(SimpleTestCase):
+    router = routers.PrimaryReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self, configured):
+        """Вне запроса (команды, сигналы) чтения идут в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_replica_reads(self, configured):
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            # После записи запрос видит ее.
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_no_replica_configured(self, configured):
+        configured.return_value = False
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_skip_replica(self, configured):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+@mock.patch('core.routers.replica_configured', return_value=True)
+class ReplicaMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_post_pins_user_to_primary(self, configured):
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(routers.REPLICA_PIN_COOKIE, response.cookies)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(routers.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_reads_inside_transaction_use_primary(self, configured):
+        with routers.replica_reads(), transaction.atomic():
+            self.assertEqual(
+                routers.PrimaryReplicaRouter().db_for_read(Post), 'default'
+            )
@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.slowlog import fingerprint
+from posts.models import Post
+
+User = get_user_model()
+LOG_DIR = tempfile.mkdtemp()
+LOG = os.path.join(LOG_DIR, 'slow.jsonl')
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=LOG)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(LOG_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        if os.path.exists(LOG):
+            os.remove(LOG)
+
+    def entries(self):
+        with open(LOG, encoding='utf-8') as log:
+            return [json.loads(line) for line in log]
+
+    def test_fingerprint_ignores_literals(self):
+        """Запросы с разными параметрами дают один отпечаток."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND s = 'a'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)   AND s = 'b''c'"),
+        )
+        self.assertNotEqual(fingerprint('SELECT a FROM t'),
+                            fingerprint('SELECT b FROM t'))
+
+    def test_query_is_logged_with_origin_and_plan(self):
+        Client().get(reverse('posts:index'))
+        entries = [entry for entry in self.entries()
+                   if 'FROM "posts_post"' in entry['sql']]
+        self.assertTrue(entries)
+        self.assertEqual(entries[0]['view'], 'posts:index')
+        self.assertTrue(all(entry['source'] for entry in entries))
+        self.assertIn('posts/includes/feed_page.html:',
+                      ' '.join(str(entry['template']) for entry in entries))
+        self.assertIn('plan', entries[0])
+        # План снимается один раз на отпечаток.
+        Client().get(reverse('posts:index'))
+        repeated = [entry for entry in self.entries()
+                    if entry['fingerprint'] == entries[0]['fingerprint']]
+        self.assertEqual(sum('plan' in entry for entry in repeated), 1)
+
+    def test_summary_command(self):
+        Client().get(reverse('posts:index'))
+        out = StringIO()
+        call_command('slow_queries', '--top', '3', stdout=out)
+        self.assertIn('Представления: posts:index', out.getvalue())
+
+        out = StringIO()
+        call_command('slow_queries', '--since', '2999-01-01T00:00:00',
+                     stdout=out)
+        self.assertIn('Отпечатков: 0', out.getvalue())
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        Client().get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(LOG))
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -13,3 +18,16 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus."""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    # Токен проверяется первым: сборщику метрик не нужна сессия.
+    allowed = token and constant_time_compare(authorization,
+                                              f'Bearer {token}')
+    if not (allowed or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.expose(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,134 @@
+"""JSON API для чтения лент и постов с комментариями.
+
+Записи читаются через values() — без экземпляров моделей — и
+сериализуются потоково: StreamingHttpResponse отдает их по мере
+чтения из курсора БД, поэтому даже страница на тысячу постов не
+собирается в памяти целиком. Листание — по курсору ?after=, размер
+страницы — ?limit= (не больше API_MAX_PAGE_SIZE).
+"""
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import Comment, Group, Post, User
+from .paginators import beyond, decode_cursor, encode_cursor, order_for_keyset
+from .timeline import follow_queryset
+
+CONTENT_TYPE = 'application/json; charset=utf-8'
+ITERATOR_CHUNK_SIZE = 500
+
+POST_VALUES = ('pk', 'text', 'pub_date', 'image', 'comments_count',
+               'author__username', 'group__slug')
+COMMENT_VALUES = ('pk', 'text', 'created', 'author__username')
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+image_storage = Post._meta.get_field('image').storage
+
+
+def post_json(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image_storage.url(row['image']) if row['image'] else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def comment_json(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': row['author__username'],
+    }
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        limit = settings.POSTS_PER_PAGE
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def stream_page(queryset, ordering, values, to_json, cursor, limit):
+    """Части JSON-объекта {"results": [...], "next": курсор}."""
+    queryset, field = order_for_keyset(queryset, ordering)
+    position = decode_cursor(cursor)
+    if position is not None:
+        lookup = 'lt' if ordering.startswith('-') else 'gt'
+        queryset = beyond(queryset, field, position, lookup)
+    rows = queryset.values(*values, field)[:limit + 1]
+    yield '{"results": ['
+    last = next_cursor = None
+    for count, row in enumerate(rows.iterator(ITERATOR_CHUNK_SIZE)):
+        if count == limit:
+            next_cursor = encode_cursor(last[field], last['pk'])
+            break
+        yield (',' if count else '') + encoder.encode(to_json(row))
+        last = row
+    yield '], "next": ' + encoder.encode(next_cursor) + '}'
+
+
+def posts_response(request, posts, ordering='-pub_date'):
+    return StreamingHttpResponse(
+        stream_page(posts, ordering, POST_VALUES, post_json,
+                    request.GET.get('after'), page_limit(request)),
+        content_type=CONTENT_TYPE
+    )
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def index(request):
+    return posts_response(request, Post.objects.all())
+
+
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return error('Группа не найдена.', 404)
+    return posts_response(request, Post.objects.filter(group=group_id))
+
+
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return error('Пользователь не найден.', 404)
+    return posts_response(request, Post.objects.filter(author=author_id))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Нужно войти в систему.', 401)
+    posts, ordering = follow_queryset(request.user)
+    return posts_response(request, posts, ordering)
+
+
+def post_detail(request, post_id):
+    """Пост и страница его комментариев в порядке создания."""
+    post = Post.objects.filter(pk=post_id).values(*POST_VALUES).first()
+    if post is None:
+        return error('Пост не найден.', 404)
+
+    def stream():
+        yield '{"post": ' + encoder.encode(post_json(post))
+        yield ', "comments": '
+        yield from stream_page(
+            Comment.objects.filter(post=post_id), 'created',
+            COMMENT_VALUES, comment_json,
+            request.GET.get('after'), page_limit(request)
+        )
+        yield '}'
+
+    return StreamingHttpResponse(stream(), content_type=CONTENT_TYPE)
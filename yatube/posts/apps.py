@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import search, signals, thumbnails  # noqa: F401
+        post_migrate.connect(search.fill_after_migrate, sender=self)
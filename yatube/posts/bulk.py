@@ -0,0 +1,21 @@
+"""Помощники для массовой загрузки постов и комментариев.
+
+bulk_create не вызывает сигналы, поэтому команды импорта и генерации
+данных сами обновляют счетчики, индекс и ленты, а даты из источника
+сохраняют, на время отключая auto_now_add.
+"""
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_dates(*fields):
+    """bulk_create вызывает pre_save полей, и auto_now_add затер бы
+    заданные даты; на время загрузки флаг у полей снимается."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
@@ -0,0 +1,102 @@
+"""Версия кеша лент.
+
+Фрагменты лент кешируются с версией в ключе. Любое изменение,
+видимое в карточке поста (пост, группа, имя автора), увеличивает
+версию, и все старые фрагменты разом перестают использоваться.
+Рядом хранится время последнего изменения — для Last-Modified.
+По той же версии кешируется число постов в лентах для paginator.
+
+Ленту подписок версия лент не сбрасывает: у каждого пользователя
+своя версия (follow_versions), ее увеличивают только подписки
+пользователя и посты авторов, на которых он подписан.
+"""
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_CHANGED_KEY = 'posts:feed_changed_at'
+FEED_COUNT_KEY = 'posts:feed_count:{version}:{scope}'
+INDEX_PAGE_KEY = 'posts:index_page:{version}:{page}'
+FOLLOW_VERSION_KEY = 'posts:follow_version:{scope}'
+
+
+def initial_version():
+    # Если ключ вытеснен из кеша, новая версия должна быть больше
+    # любой выданной раньше, иначе всплывут устаревшие фрагменты.
+    return int(time.time() * 1000)
+
+
+def current_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), None)
+
+
+def feed_version():
+    return current_version(FEED_VERSION_KEY)
+
+
+def feed_changed_at():
+    """Время последнего изменения лент; если оно неизвестно (ключ
+    вытеснен), считаем, что ленты изменились только что."""
+    changed_at = cache.get(FEED_CHANGED_KEY)
+    if changed_at is None:
+        changed_at = time.time()
+        cache.add(FEED_CHANGED_KEY, changed_at, None)
+    return datetime.fromtimestamp(changed_at, timezone.utc)
+
+
+def bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+    cache.set(FEED_CHANGED_KEY, time.time(), None)
+
+
+def feed_count(queryset, scope):
+    """Число записей ленты scope ('index', 'group:1', ...): COUNT(*)
+    выполняется один раз на версию лент, а не на каждый запрос."""
+    key = FEED_COUNT_KEY.format(version=feed_version(), scope=scope)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.FEED_CACHE_TIMEOUT)
+    return count
+
+
+def forget_feed_count(scope):
+    cache.delete(FEED_COUNT_KEY.format(version=feed_version(), scope=scope))
+
+
+def index_cache_key(request):
+    """Ключ кеша разметки страницы главной ленты по номеру или None
+    для страниц по курсору: их выборка и так читает только диапазон
+    индекса, а из кеша страница берется без чтения постов."""
+    page = request.GET.get('page', '1')
+    if (request.GET.get('after') or request.GET.get('before')
+            or not page.isdigit() or int(page) < 1):
+        return None
+    return INDEX_PAGE_KEY.format(version=feed_version(), page=int(page))
+
+
+def follow_versions(scopes):
+    """Версии кеша ленты подписок: 'all', 'user:<id>', 'author:<id>'."""
+    keys = [FOLLOW_VERSION_KEY.format(scope=scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    return [versions.get(key) or current_version(key) for key in keys]
+
+
+def bump_follow_versions(scopes):
+    for scope in scopes:
+        bump_version(FOLLOW_VERSION_KEY.format(scope=scope))
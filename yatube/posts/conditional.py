@@ -0,0 +1,92 @@
+"""Валидаторы для условных GET-запросов (ETag и Last-Modified).
+
+Валидаторы считаются до основных запросов страницы из того, что
+уже есть: версии лент в кеше, денормализованных счетчиков и даты
+последнего комментария. В ETag страниц, которые выглядят по-разному
+для разных пользователей, входят также пользователь и его
+CSRF-cookie. Если клиент прислал совпадающий If-None-Match или
+If-Modified-Since, декоратор condition отвечает 304 без рендеринга.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, Max, OuterRef
+from django.middleware.csrf import get_token
+
+from .caching import feed_changed_at, feed_version
+from .models import Follow, Post
+
+User = get_user_model()
+
+
+def _etag(request, *parts, personal=True):
+    viewer = None
+    if personal:
+        # get_token выдает cookie, если ее еще нет, — тогда ETag
+        # первого ответа совпадет со следующим запросом.
+        get_token(request)
+        viewer = (
+            request.user.pk if request.user.is_authenticated else None,
+            request.META['CSRF_COOKIE'],
+        )
+    raw = repr((feed_version(), request.get_full_path(), viewer, parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_etag(request, **kwargs):
+    """ETag ленты: все, что видно в карточках, меняет версию лент."""
+    return _etag(request)
+
+
+def public_etag(request, **kwargs):
+    # Страница одинакова для всех, сессию можно не читать.
+    return _etag(request, personal=False)
+
+
+def feed_last_modified(request, **kwargs):
+    return feed_changed_at()
+
+
+def profile_etag(request, username):
+    """ETag профиля: версия лент, счетчики автора и подписка на него."""
+    following = Follow.objects.filter(
+        user=request.user.pk, author=OuterRef('pk')
+    )
+    state = (
+        User.objects.filter(username=username)
+        .annotate(is_followed=Exists(following))
+        .values_list('pk', 'counters__posts_count',
+                     'counters__followers_count',
+                     'counters__following_count', 'is_followed')
+        .first()
+    )
+    if state is None:
+        return None
+    return _etag(request, state)
+
+
+def _post_state(request, post_id):
+    # ETag и Last-Modified поста считаются одним запросом.
+    if not hasattr(request, '_post_state'):
+        request._post_state = (
+            Post.objects.filter(pk=post_id).order_by()
+            .annotate(last_comment=Max('comments__created'))
+            .values_list('comments_count', 'last_comment')
+            .first()
+        )
+    return request._post_state
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return _etag(request, state)
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    changed_at, last_comment = feed_changed_at(), state[1]
+    return max(changed_at, last_comment) if last_comment else changed_at
@@ -0,0 +1,113 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются атомарными UPDATE ... SET x = x + 1 в той же
+транзакции, что и запись Post, Comment или Follow. Строка UserCounters
+создается лениво: при первом обращении значения считаются по таблицам.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний объект."""
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def actual_user_counts(user_id):
+    return {
+        'posts_count': Post.objects.filter(author=user_id).count(),
+        'followers_count': Follow.objects.filter(author=user_id).count(),
+        'following_count': Follow.objects.filter(user=user_id).count(),
+    }
+
+
+def user_counters(user_id):
+    """Возвращает счетчики пользователя, при необходимости создавая их."""
+    try:
+        return UserCounters.objects.get(user_id=user_id)
+    except UserCounters.DoesNotExist:
+        counters, _ = UserCounters.objects.update_or_create(
+            user_id=user_id, defaults=actual_user_counts(user_id)
+        )
+        return counters
+
+
+def shifted(field, delta):
+    """Выражение field + delta. Уменьшение не опускается ниже нуля:
+    у разошедшегося счетчика CHECK (>= 0) сорвал бы удаление."""
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def change_user(user_id, create=True, **deltas):
+    """Сдвигает счетчики пользователя. С create=False отсутствующая
+    строка не создается: при каскадном удалении пользователя она
+    нарушила бы внешний ключ."""
+    updated = UserCounters.objects.filter(user_id=user_id).update(
+        **{field: shifted(field, delta) for field, delta in deltas.items()}
+    )
+    if not updated and create:
+        # Строки еще нет: создаем ее сразу с актуальными значениями.
+        user_counters(user_id)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=shifted('posts_count', delta)
+        )
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shifted('comments_count', delta)
+    )
+
+
+def reconcile():
+    """Пересчитывает разошедшиеся счетчики, возвращает число исправлений."""
+    fixed = 0
+    groups = Group.objects.annotate(
+        actual=count_of(Post, 'group')
+    ).exclude(posts_count=F('actual'))
+    for pk, actual in list(groups.values_list('pk', 'actual')):
+        Group.objects.filter(pk=pk).update(posts_count=actual)
+        fixed += 1
+    posts = Post.objects.annotate(
+        actual=count_of(Comment, 'post')
+    ).exclude(comments_count=F('actual'))
+    for pk, actual in list(posts.values_list('pk', 'actual')):
+        Post.objects.filter(pk=pk).update(comments_count=actual)
+        fixed += 1
+    users = User.objects.annotate(
+        actual_posts=count_of(Post, 'author'),
+        actual_followers=count_of(Follow, 'author'),
+        actual_following=count_of(Follow, 'user'),
+    ).filter(
+        Q(counters__isnull=True)
+        | ~Q(counters__posts_count=F('actual_posts'))
+        | ~Q(counters__followers_count=F('actual_followers'))
+        | ~Q(counters__following_count=F('actual_following'))
+    )
+    rows = users.values_list(
+        'pk', 'actual_posts', 'actual_followers', 'actual_following'
+    )
+    for pk, posts_count, followers, following in list(rows):
+        UserCounters.objects.update_or_create(user_id=pk, defaults={
+            'posts_count': posts_count,
+            'followers_count': followers,
+            'following_count': following,
+        })
+        fixed += 1
+    return fixed
@@ -1,7 +1,10 @@
+from django import forms
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, Textarea
 
-from .models import Comment, Post
+from .images import ingest
+from .models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -22,6 +25,12 @@ class PostForm(ModelForm):
             'text': ('Текст'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -34,3 +43,15 @@ class CommentForm(ModelForm):
         help_texts = {
             'text': 'Текст нового комментария',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа',
+        to_field_name='slug', required=False
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(), label='Автор', to_field_name='username',
+        required=False, widget=forms.TextInput
+    )
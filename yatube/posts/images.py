@@ -0,0 +1,74 @@
+"""Прием картинок постов.
+
+Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет на диск
+кусками, поэтому файл целиком в памяти не оказывается. Размеры
+картинки проверяются по заголовку до декодирования, JPEG
+декодируется сразу уменьшенным (draft), так что пик памяти
+ограничен POST_IMAGE_MAX_PIXELS, а не размером присланного файла.
+Результат — уменьшенный до POST_IMAGE_MAX_SIZE, повернутый по
+EXIF и без метаданных — пересохраняется во временный файл:
+прогрессивный JPEG, а картинки с прозрачностью — WebP (или PNG,
+если Pillow собран без WebP). Анимированные картинки сохраняются
+как есть: перекодирование убило бы анимацию.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps, features
+
+Image.MAX_IMAGE_PIXELS = settings.POST_IMAGE_MAX_PIXELS
+
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png'}
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def ingest(upload):
+    """Проверяет и перекодирует загруженную картинку поста."""
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл слишком большой: не более %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE >> 20},
+        )
+    upload.seek(0)
+    # Image.open читает только заголовок, пиксели еще не декодированы.
+    with Image.open(upload) as image:
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Картинка слишком большая: %(width)d×%(height)d.',
+                code='image_too_large',
+                params={'width': width, 'height': height},
+            )
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        max_width, max_height = settings.POST_IMAGE_MAX_SIZE
+        scale = min(max_width / width, max_height / height, 1)
+        # JPEG декодируется сразу в уменьшенном в 2–8 раз масштабе.
+        image.draft('RGB', (round(width * scale), round(height * scale)))
+        image.thumbnail(settings.POST_IMAGE_MAX_SIZE, Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+    if has_alpha(image):
+        format_ = 'WEBP' if features.check('webp') else 'PNG'
+        image = image.convert('RGBA')
+        options = {'quality': settings.POST_IMAGE_QUALITY, 'optimize': True}
+    else:
+        format_ = 'JPEG'
+        image = image.convert('RGB')
+        options = {'quality': settings.POST_IMAGE_QUALITY,
+                   'optimize': True, 'progressive': True}
+    # Метаданные не передаются в save, поэтому EXIF не сохраняется.
+    output = tempfile.TemporaryFile()
+    image.save(output, format_, **options)
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=name + EXTENSIONS[format_])
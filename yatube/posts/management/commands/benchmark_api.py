@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время ответа и пик выделенной памяти '
+            'HTML-страниц и JSON API на текущих данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=1000,
+                            help='Размер большой страницы API')
+
+    def pairs(self, limit):
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if group is None or post is None:
+            raise CommandError('Нужны посты и группы, см. команду seed.')
+        author = post.author.username
+        return [
+            ('index', reverse('posts:index'),
+             reverse('posts:api_index')),
+            ('group', reverse('posts:group_list', args=[group.slug]),
+             reverse('posts:api_group_posts', args=[group.slug])),
+            ('profile', reverse('posts:profile', args=[author]),
+             reverse('posts:api_profile', args=[author])),
+            ('post', reverse('posts:post_detail', args=[post.pk]),
+             reverse('posts:api_post_detail', args=[post.pk])),
+        ]
+
+    def measure(self, client, url, params, repeat):
+        """Среднее время в мс и пик памяти в КБ на один запрос."""
+        elapsed = peak = 0
+        for _ in range(repeat):
+            # Без кеша фрагментов: сравнивается стоимость рендеринга.
+            cache.clear()
+            reset_queries()
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(url, params)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed += time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return elapsed / repeat * 1000, peak / 1024, size / 1024
+
+    def handle(self, *args, **options):
+        client = Client()
+        repeat, limit = options['repeat'], options['limit']
+        self.stdout.write(
+            f'{"page":<8} {"variant":<12} {"ms":>8} {"peak KB":>9} '
+            f'{"body KB":>9}'
+        )
+        for name, html_url, api_url in self.pairs(limit):
+            variants = (
+                ('html', html_url, {}),
+                ('api', api_url, {}),
+                (f'api x{limit}', api_url, {'limit': limit}),
+            )
+            for variant, url, params in variants:
+                ms, peak, size = self.measure(client, url, params, repeat)
+                self.stdout.write(
+                    f'{name:<8} {variant:<12} {ms:>8.2f} {peak:>9.0f} '
+                    f'{size:>9.1f}'
+                )
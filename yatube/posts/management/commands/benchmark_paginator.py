@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from posts.models import Post
+from posts.paginators import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер и время рендеринга навигации по страницам '
+            'с сокращенным списком номеров и со всеми номерами '
+            'при разном числе постов. Посты не создаются: число записей '
+            'подставляется в paginator.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--counts', type=int, nargs='+',
+                            default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def page(self, count, full_range):
+        paginator = CursorPaginator(Post.objects.none(),
+                                    settings.POSTS_PER_PAGE)
+        paginator.count = count
+        page = paginator.page(paginator.num_pages // 2 or 1)
+        if full_range:
+            # Так шаблон выводил ссылки до сокращения списка.
+            page.elided_page_range = paginator.page_range
+        return page
+
+    def measure(self, page, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            html = render_to_string('posts/includes/paginator.html',
+                                    {'page_obj': page})
+        return (time.perf_counter() - started) / repeat * 1000, len(html)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"posts":>9} {"variant":<8} {"links":>7} {"ms":>9} '
+            f'{"KB":>9}'
+        )
+        for count in options['counts']:
+            for variant, full_range in (('elided', False), ('full', True)):
+                page = self.page(count, full_range)
+                ms, size = self.measure(page, options['repeat'])
+                self.stdout.write(
+                    f'{count:>9} {variant:<8} '
+                    f'{len(page.elided_page_range):>7} {ms:>9.2f} '
+                    f'{size / 1024:>9.1f}'
+                )
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы и время запросов, которые выполняют '
+            'страницы ленты, профиля, группы, поста и подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100,
+                            help='Сколько раз выполнить каждый запрос')
+
+    def queries(self):
+        per_page = settings.POSTS_PER_PAGE
+        author = User.objects.order_by('pk').first()
+        group = Group.objects.order_by('pk').first()
+        post = Post.objects.order_by('pk').first()
+        author_id = author.pk if author else 0
+        posts = Post.objects.with_related()
+
+        def first_page(queryset, ordering='-pub_date'):
+            return CursorPaginator(queryset, per_page, ordering) \
+                .object_list[:per_page + 1]
+
+        return {
+            'index': first_page(posts),
+            'group_list': first_page(
+                posts.filter(group=group.pk if group else 0)
+            ),
+            'profile': first_page(posts.filter(author=author_id)),
+            'profile following': Follow.objects.filter(
+                user=author_id, author=author_id
+            ),
+            'post_detail comments': first_page(
+                Comment.objects.with_related().filter(
+                    post=post.pk if post else 0
+                ),
+                ordering='created'
+            ),
+            'unfollow': Follow.objects.filter(
+                user=author_id, author=author_id
+            ).values('pk'),
+        }
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for name, queryset in self.queries().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'  {line}')
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f'  {elapsed:.3f} мс на запрос')
@@ -0,0 +1,119 @@
+import csv
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Comment, Follow, Group, Post
+
+# Таблица: модель, поле-водяной знак и пары (колонка, поле в values_list).
+# Колонки постов совпадают с тем, что читает import_posts.
+TABLES = {
+    'groups': (Group, None, (
+        ('id', 'pk'), ('title', 'title'), ('slug', 'slug'),
+        ('description', 'description'), ('posts_count', 'posts_count'),
+    )),
+    'posts': (Post, 'pub_date', (
+        ('id', 'pk'), ('text', 'text'), ('pub_date', 'pub_date'),
+        ('author', 'author__username'), ('group', 'group__slug'),
+        ('image', 'image'), ('comments_count', 'comments_count'),
+    )),
+    'comments': (Comment, 'created', (
+        ('id', 'pk'), ('post', 'post_id'), ('author', 'author__username'),
+        ('text', 'text'), ('created', 'created'),
+    )),
+    'follows': (Follow, None, (
+        ('user', 'user__username'), ('author', 'author__username'),
+    )),
+}
+
+# Баланс между скоростью и размером: 9 сжимает чуть лучше, но вдвое дольше.
+COMPRESS_LEVEL = 6
+
+
+class JSONLinesWriter:
+    def __init__(self, output, columns):
+        self.output = output
+        self.columns = columns
+        self.encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def write(self, row):
+        self.output.write(self.encoder.encode(dict(zip(self.columns, row))))
+        self.output.write('\n')
+
+
+class CSVWriter:
+    def __init__(self, output, columns):
+        self.writer = csv.writer(output)
+        self.writer.writerow(columns)
+
+    def write(self, row):
+        self.writer.writerow(
+            [value.isoformat() if hasattr(value, 'isoformat') else value
+             for value in row]
+        )
+
+
+WRITERS = {'jsonl': JSONLinesWriter, 'csv': CSVWriter}
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в сжатые '
+            'файлы JSONL или CSV, не загружая таблицы в память. '
+            'С --since выгружаются только посты и комментарии новее '
+            'отметки; группы и подписки выгружаются целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Каталог для файлов выгрузки')
+        parser.add_argument('--format', choices=sorted(WRITERS),
+                            default='jsonl')
+        parser.add_argument('--since',
+                            help='Отметка предыдущей выгрузки (ISO 8601)')
+        parser.add_argument('--tables', nargs='+', choices=list(TABLES),
+                            default=list(TABLES))
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Неверная отметка: {options["since"]}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        os.makedirs(options['output'], exist_ok=True)
+        # Отметка берется до чтения: записи, добавленные во время
+        # выгрузки, попадут в следующую.
+        watermark = timezone.now()
+        for table in options['tables']:
+            started = time.monotonic()
+            path, rows = self.export(table, since, options)
+            self.stdout.write(
+                f'{path}: {rows} строк за {time.monotonic() - started:.1f} с'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Следующая выгрузка: --since {watermark.isoformat()}'
+        ))
+
+    def export(self, table, since, options):
+        model, date_field, fields = TABLES[table]
+        columns = [column for column, _ in fields]
+        queryset = model.objects.order_by('pk')
+        if since is not None and date_field is not None:
+            queryset = queryset.filter(**{f'{date_field}__gt': since})
+        values = queryset.values_list(*[field for _, field in fields])
+
+        path = os.path.join(options['output'],
+                            f'{table}.{options["format"]}.gz')
+        rows = 0
+        with gzip.open(path, 'wt', encoding='utf-8', newline='',
+                       compresslevel=COMPRESS_LEVEL) as output:
+            writer = WRITERS[options['format']](output, columns)
+            for row in values.iterator(chunk_size=options['chunk_size']):
+                writer.write(row)
+                rows += 1
+        return path, rows
@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры всех постов с картинками в пуле процессов; '
+            'запускается после изменения POST_THUMBNAIL_PROFILES.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Число процессов (по умолчанию — ядер CPU)')
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать уже существующие миниатюры')
+
+    def handle(self, *args, **options):
+        post_ids = list(
+            Post.objects.exclude(image='').order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        size = options['chunk_size']
+        chunks = [post_ids[i:i + size] for i in range(0, len(post_ids), size)]
+        # Дочерние процессы не должны делить соединение с родителем.
+        connections.close_all()
+        started = time.monotonic()
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [
+                pool.submit(thumbnails.generate, chunk, options['force'])
+                for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                done += future.result()
+                self.stdout.write(f'Готово {done} из {len(post_ids)}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры построены для {done} постов за {elapsed:.1f} с.'
+        ))
@@ -0,0 +1,190 @@
+import csv
+import gzip
+import json
+import os
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, media, search, timeline
+from posts.bulk import keep_dates
+from posts.caching import bump_feed_version
+from posts.models import Group, Post, UserCounters
+
+User = get_user_model()
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(path):
+    """Строки файла по одной: JSONL или CSV с заголовком. Строки JSONL
+    отдаются как есть и разбираются в build(), чтобы битая строка
+    пропускалась вместе с остальными ошибочными."""
+    name = path[:-3] if path.endswith('.gz') else path
+    with open_text(path) as source:
+        if name.endswith('.csv'):
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield line
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV (в том числе .gz) пачками '
+            'bulk_create и пересчитывает денормализованные данные. '
+            'Поля строки: text, author (username), group (slug), '
+            'pub_date (ISO 8601), image (путь к файлу).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--images-dir', default='',
+                            help='Каталог, от которого считаются пути image')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Создавать неизвестных авторов и группы')
+        parser.add_argument('--now', action='store_true',
+                            help='Ставить дату импорта вместо pub_date')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'Файл не найден: {options["path"]}')
+        self.options = options
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.posts_by_author = Counter()
+        self.posts_by_group = Counter()
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+
+        started = time.monotonic()
+        imported = skipped = 0
+        batch = []
+        fields = [] if options['now'] else [Post._meta.get_field('pub_date')]
+        try:
+            with keep_dates(*fields):
+                rows = read_rows(options['path'])
+                for line, row in enumerate(rows, 1):
+                    try:
+                        batch.append(self.build(row))
+                    except (KeyError, ValueError, OSError) as error:
+                        skipped += 1
+                        self.stderr.write(
+                            f'Строка {line} пропущена: {error!r}'
+                        )
+                        continue
+                    if len(batch) == options['batch_size']:
+                        imported += self.flush(batch)
+                        batch = []
+                        rate = imported / (time.monotonic() - started)
+                        self.stdout.write(
+                            f'Импортировано {imported}, {rate:.0f} строк/с'
+                        )
+                if batch:
+                    imported += self.flush(batch)
+        finally:
+            # Уже сохраненные пачки должны попасть в счетчики и ленты,
+            # даже если импорт прервался.
+            self.stdout.write('Пересчет денормализованных данных...')
+            self.update_denormalized(last_pk)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {imported}, пропущено строк: {skipped}, '
+            f'{imported / max(elapsed, 1e-9):.0f} строк/с.'
+        ))
+
+    def build(self, row):
+        if isinstance(row, str):
+            row = json.loads(row)
+            if not isinstance(row, dict):
+                raise ValueError('строка не является объектом JSON')
+        text = row['text']
+        if not text:
+            raise ValueError('пустой text')
+        post = Post(
+            text=text,
+            author_id=self.author_id(row['author']),
+            group_id=self.group_id(row.get('group')),
+        )
+        if not self.options['now']:
+            post.pub_date = self.parse_date(row.get('pub_date'))
+        if row.get('image'):
+            post.image = self.store_image(row['image'])
+        return post
+
+    def author_id(self, username):
+        if username not in self.authors:
+            if not self.options['create_missing']:
+                raise ValueError(f'неизвестный автор {username!r}')
+            self.authors[username] = User.objects.create(
+                username=username, password=make_password(None)
+            ).pk
+        return self.authors[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            if not self.options['create_missing']:
+                raise ValueError(f'неизвестная группа {slug!r}')
+            self.groups[slug] = Group.objects.create(
+                title=slug, slug=slug, description=''
+            ).pk
+        return self.groups[slug]
+
+    def parse_date(self, value):
+        if not value:
+            return timezone.now()
+        pub_date = parse_datetime(value)
+        if pub_date is None:
+            raise ValueError(f'неверная дата {value!r}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return pub_date
+
+    def store_image(self, path):
+        # Картинки из выгрузки уже прошли проверку на старой площадке,
+        # поэтому не перекодируются, а просто кладутся в хранилище:
+        # одинаковые файлы сохранятся один раз.
+        path = os.path.join(self.options['images_dir'], path)
+        upload_to = Post._meta.get_field('image').upload_to
+        with open(path, 'rb') as image:
+            return media.storage.save(
+                upload_to + os.path.basename(path), File(image)
+            )
+
+    def flush(self, batch):
+        with transaction.atomic():
+            Post.objects.bulk_create(batch)
+        for post in batch:
+            self.posts_by_author[post.author_id] += 1
+            self.posts_by_group[post.group_id] += 1
+        return len(batch)
+
+    def update_denormalized(self, last_pk):
+        """bulk_create не вызывает сигналы, поэтому счетчики, ссылки
+        на картинки, поисковый индекс и ленты обновляются здесь."""
+        with transaction.atomic():
+            # Строки UserCounters, которых еще нет, создадутся
+            # при первом обращении уже с актуальными значениями.
+            for author_id, added in self.posts_by_author.items():
+                UserCounters.objects.filter(user_id=author_id).update(
+                    posts_count=F('posts_count') + added
+                )
+            for group_id, added in self.posts_by_group.items():
+                counters.change_group(group_id, added)
+        media.recount()
+        search.rebuild(after=last_pk)
+        timeline.rebuild_followers(self.posts_by_author)
+        bump_feed_version()
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts import media
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов, загруженные до адресуемого '
+            'хранилища, в шардированные каталоги и пересчитывает ссылки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = media.storage
+        names = (
+            Post.objects.exclude(image='').order_by()
+            .values_list('image', flat=True).distinct()
+        )
+        legacy = [name for name in names if not storage.is_hashed(name)]
+        size = options['batch_size']
+        moved = missing = 0
+        for start in range(0, len(legacy), size):
+            renames = {}
+            for name in legacy[start:start + size]:
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Файл не найден: {name}')
+                    continue
+                renames[name] = storage.adopt(name)
+            with transaction.atomic():
+                for old, new in renames.items():
+                    Post.objects.filter(image=old).update(image=new)
+            # Старые имена удаляются только после коммита, поэтому
+            # прерванную команду можно просто запустить снова.
+            for old in renames:
+                delete(ImageFile(old, storage))
+            moved += len(renames)
+            self.stdout.write(f'Перенесено {moved} из {len(legacy)}')
+        files = media.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}, '
+            f'файлов в хранилище: {files}.'
+        ))
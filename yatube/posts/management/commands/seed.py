@@ -0,0 +1,277 @@
+import io
+import itertools
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import media, search, timeline
+from posts.bulk import keep_dates
+from posts.caching import bump_feed_version
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+# Показатель распределения Парето для числа подписок и комментариев:
+# при 1.5 у большинства постов комментариев нет или почти нет,
+# а у единиц их тысячи.
+TAIL_ALPHA = 1.5
+
+# Даты не зависят от дня запуска, чтобы данные повторялись.
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    'город', 'утро', 'кофе', 'книга', 'дорога', 'море', 'лес', 'музыка',
+    'работа', 'проект', 'друзья', 'вечер', 'прогулка', 'фотография',
+    'история', 'погода', 'зима', 'лето', 'поезд', 'горы', 'река', 'кино',
+    'новости', 'идея', 'код', 'релиз', 'ошибка', 'команда', 'встреча',
+    'новый', 'старый', 'большой', 'тихий', 'яркий', 'долгий', 'первый',
+    'сегодня', 'вчера', 'снова', 'наконец', 'очень', 'почти', 'всегда',
+    'смотрел', 'читал', 'писал', 'ехал', 'думал', 'нашел', 'сделал',
+    'и', 'в', 'на', 'с', 'про', 'после', 'до', 'без', 'но', 'а',
+)
+
+
+def heavy_tail(rng, mean):
+    """Целое с распределением Парето и заданным средним."""
+    return int((rng.paretovariate(TAIL_ALPHA) - 1) * mean * (TAIL_ALPHA - 1))
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса для random.choices: вес i-го
+    по популярности (с единицы) равен 1 / i ** skew."""
+    return list(itertools.accumulate(
+        1 / (rank ** skew) for rank in range(1, count + 1)
+    ))
+
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=max(3, int(rng.lognormvariate(2.5, 0.8))))
+    return ' '.join(words).capitalize() + '.'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочных '
+            'проверок: пользователи с неравномерной популярностью, посты, '
+            'подписки, комментарии и картинки. Одинаковый --seed дает '
+            'одинаковые данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows-per-user', type=float, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--comments-per-post', type=float, default=3,
+                            help='Среднее число комментариев поста')
+        parser.add_argument('--image-share', type=float, default=0.1,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--image-pool', type=int, default=50,
+                            help='Сколько разных картинок сгенерировать')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа для популярности')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed',
+                            help='Префикс имен пользователей и групп')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не собирать ленты подписок: на больших объемах это '
+                 'до TIMELINE_LENGTH строк на каждого пользователя'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username=f'{prefix}1').exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix!r} уже есть, задайте --prefix.'
+            )
+        started = time.monotonic()
+        self.step('Пользователи', self.create_users)
+        self.step('Группы', self.create_groups)
+        self.step('Подписки', self.create_follows)
+        self.step('Картинки', self.create_images)
+        self.step('Посты и комментарии', self.create_posts)
+        self.step('Счетчики', self.update_counters)
+        self.step('Поисковый индекс', self.rebuild_search)
+        if not options['skip_timelines']:
+            self.step('Ленты подписок', timeline.rebuild_all)
+        media.recount()
+        bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def step(self, title, action):
+        started = time.monotonic()
+        action()
+        self.stdout.write(f'{title}: {time.monotonic() - started:.1f} с')
+
+    def bulk_create(self, model, objects, **kwargs):
+        """Вставляет объекты пачками, каждую в своей транзакции."""
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                return
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+
+    def new_pks(self, model, last_pk):
+        return list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def create_users(self):
+        last_pk = self.last_pk(User)
+        prefix = self.options['prefix']
+        password = UNUSABLE_PASSWORD_PREFIX + 'seed'
+        self.bulk_create(User, (
+            User(username=f'{prefix}{number}', password=password,
+                 first_name=f'Пользователь {number}', date_joined=START)
+            for number in range(1, self.options['users'] + 1)
+        ))
+        # Первые по номеру — самые популярные.
+        self.users = self.new_pks(User, last_pk)
+        self.popularity = zipf_weights(len(self.users), self.options['skew'])
+
+    def create_groups(self):
+        last_pk = self.last_pk(Group)
+        prefix = self.options['prefix']
+        self.bulk_create(Group, (
+            Group(title=f'Сообщество {number}', slug=f'{prefix}-{number}',
+                  description=sentence(self.rng))
+            for number in range(1, self.options['groups'] + 1)
+        ))
+        self.groups = self.new_pks(Group, last_pk)
+        self.group_weights = zipf_weights(len(self.groups), 1)
+
+    def follows(self):
+        rng, users = self.rng, self.users
+        mean = self.options['follows_per_user']
+        for user in users:
+            count = min(heavy_tail(rng, mean), len(users) - 1)
+            authors = set(rng.choices(users, cum_weights=self.popularity,
+                                      k=count))
+            authors.discard(user)
+            for author in sorted(authors):
+                yield Follow(user_id=user, author_id=author)
+
+    def create_follows(self):
+        self.bulk_create(Follow, self.follows())
+
+    def create_images(self):
+        self.images = []
+        upload_to = Post._meta.get_field('image').upload_to
+        for number in range(self.options['image_pool']):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', (1200, 800), color)
+            image.paste(
+                tuple(255 - channel for channel in color),
+                (self.rng.randrange(600), self.rng.randrange(400),
+                 self.rng.randrange(600, 1200), self.rng.randrange(400, 800))
+            )
+            content = io.BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            self.images.append(media.storage.save(
+                f'{upload_to}seed{number}.jpg', ContentFile(content.getvalue())
+            ))
+
+    def create_posts(self):
+        options = self.options
+        total = options['posts']
+        step = timedelta(days=options['days']) / max(total, 1)
+        self.posts_by_author = Counter()
+        self.posts_by_group = Counter()
+        fields = (Post._meta.get_field('pub_date'),
+                  Comment._meta.get_field('created'))
+        self.first_post_pk = self.last_pk(Post)
+        with keep_dates(*fields):
+            for offset in range(0, total, self.batch_size):
+                numbers = range(offset, min(offset + self.batch_size, total))
+                posts = [self.post(START + step * number)
+                         for number in numbers]
+                last_pk = self.last_pk(Post)
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                    # SQLite не возвращает id из bulk_create.
+                    pks = self.new_pks(Post, last_pk)
+                    self.bulk_create(Comment, itertools.chain.from_iterable(
+                        self.comments(pk, post) for pk, post in zip(pks, posts)
+                    ))
+                self.stdout.write(f'Постов: {numbers.stop} из {total}')
+
+    def post(self, pub_date):
+        rng, options = self.rng, self.options
+        author = rng.choices(self.users, cum_weights=self.popularity)[0]
+        group = None
+        if self.groups and rng.random() < 0.7:
+            group = rng.choices(self.groups, cum_weights=self.group_weights)[0]
+        image = ''
+        if self.images and rng.random() < options['image_share']:
+            image = rng.choice(self.images)
+        self.posts_by_author[author] += 1
+        self.posts_by_group[group] += 1
+        return Post(
+            text=' '.join(sentence(rng) for _ in range(rng.randint(1, 6))),
+            author_id=author, group_id=group, image=image, pub_date=pub_date,
+            comments_count=heavy_tail(rng, options['comments_per_post']),
+        )
+
+    def comments(self, pk, post):
+        rng = self.rng
+        for _ in range(post.comments_count):
+            yield Comment(
+                post_id=pk, author_id=rng.choice(self.users),
+                text=sentence(rng),
+                created=post.pub_date + timedelta(
+                    minutes=rng.expovariate(1 / 600)
+                ),
+            )
+
+    def update_counters(self):
+        followers = Counter()
+        following = Counter()
+        # Сгенерированные пользователи — последние по id.
+        follows = Follow.objects.filter(
+            user__gte=self.users[0]
+        ).values_list(
+            'user', 'author'
+        )
+        for user, author in follows.iterator(chunk_size=self.batch_size):
+            following[user] += 1
+            followers[author] += 1
+        self.bulk_create(UserCounters, (
+            UserCounters(user_id=user,
+                         posts_count=self.posts_by_author[user],
+                         followers_count=followers[user],
+                         following_count=following[user])
+            for user in self.users
+        ))
+        with transaction.atomic():
+            for group, added in self.posts_by_group.items():
+                if group is not None:
+                    Group.objects.filter(pk=group).update(
+                        posts_count=F('posts_count') + added
+                    )
+
+    def rebuild_search(self):
+        search.rebuild(after=self.first_post_pk)
@@ -0,0 +1,64 @@
+"""Счетчики ссылок на файлы адресуемого хранилища картинок.
+
+Одинаковые картинки разных постов лежат в одном файле, поэтому
+удалять его можно только когда на него не ссылается ни один пост.
+Счетчик меняется в той же транзакции, что и запись Post, а сам
+файл удаляется после коммита. Имена, сохраненные до перехода на
+ContentAddressedStorage, не учитываются, пока их не перенесет
+команда migrate_media.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaBlob, Post
+
+storage = Post._meta.get_field('image').storage
+
+
+def retain(name):
+    if not name or not storage.is_hashed(name):
+        return
+    updated = MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+    if not updated:
+        MediaBlob.objects.create(name=name, refs=1)
+
+
+def release(name):
+    if not name or not storage.is_hashed(name):
+        return
+    MediaBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    deleted, _ = MediaBlob.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _delete_unreferenced(name))
+
+
+def _delete_unreferenced(name):
+    # Пока транзакция коммитилась, ту же картинку могли загрузить снова.
+    if not MediaBlob.objects.filter(name=name).exists():
+        # Вместе с файлом удаляются его миниатюры и записи sorl.
+        delete(ImageFile(name, storage))
+
+
+def recount():
+    """Пересчитывает ссылки по таблице постов, возвращает число файлов."""
+    refs = dict(
+        Post.objects.exclude(image='').order_by().values_list('image')
+        .annotate(refs=Count('pk'))
+    )
+    refs = {name: count for name, count in refs.items()
+            if storage.is_hashed(name)}
+    with transaction.atomic():
+        MediaBlob.objects.exclude(name__in=list(refs)).delete()
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, refs=count) for name, count in refs.items()],
+            ignore_conflicts=True
+        )
+        for name, count in refs.items():
+            MediaBlob.objects.filter(name=name).exclude(refs=count).update(
+                refs=count
+            )
+    return len(refs)
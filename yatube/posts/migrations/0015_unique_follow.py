@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+        ).values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def dedupe_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    duplicates = (
+        Follow.objects.order_by().values('user', 'author')
+        .annotate(keep=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    )
+    affected = set()
+    for row in list(duplicates):
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+        affected.update((row['user'], row['author']))
+    # Дубли попадали в счетчики подписок, пересчитываем их.
+    UserCounters.objects.filter(user__in=affected).update(
+        followers_count=count_of(Follow, 'author'),
+        following_count=count_of(Follow, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
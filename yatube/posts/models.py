@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -8,11 +10,18 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        """Подтягивает автора и группу одним запросом с постами."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField('текст поста',
                             help_text='Напишите, о чем ваш пост')
@@ -34,18 +43,35 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты автора и группы фильтруют по ним и сортируют по дате.
+        indexes = [
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class CommentQuerySet(models.QuerySet):
+    def with_related(self):
+        """Подтягивает автора комментария одним запросом."""
+        return self.select_related('author')
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post, related_name="comments",
@@ -60,6 +86,14 @@ class Comment(models.Model):
         auto_now_add=True, verbose_name="Дата комментария"
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -68,3 +102,58 @@ class Follow(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="following"
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются вместе с записями Post и Follow,
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE,
+        primary_key=True, related_name="counters"
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты «Избранные авторы».
+
+    Заполняется при публикации поста (fan-out on write),
+    дата поста продублирована для чтения ленты по индексу.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx'),
+        ]
+
+
+class MediaBlob(models.Model):
+    """Файл адресуемого хранилища и число постов, которые на него
+    ссылаются; см. posts/media.py."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
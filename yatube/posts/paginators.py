@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .caching import feed_count
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(value, pk):
+    """Кодирует позицию записи в ленте в строку для URL."""
+    delta = value - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 10 ** 6
+    return f'{micros + delta.microseconds}.{pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, для испорченного значения возвращает None."""
+    try:
+        micros, pk = cursor.split('.')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def order_for_keyset(queryset, ordering):
+    """Упорядочивает queryset по паре (поле, pk) для ключевой навигации.
+
+    Поле из связанной таблицы (например, '-timeline_entries__pub_date')
+    аннотируется как cursor_value. Возвращает queryset и имя поля,
+    из которого брать значение курсора.
+    """
+    descending = ordering.startswith('-')
+    field = ordering.lstrip('-')
+    if LOOKUP_SEP in field:
+        queryset = queryset.annotate(cursor_value=F(field))
+        field = 'cursor_value'
+    prefix = '-' if descending else ''
+    return queryset.order_by(prefix + field, prefix + 'pk'), field
+
+
+def beyond(queryset, field, position, lookup):
+    """Записи строго после позиции (значение, pk) в порядке lookup."""
+    value, pk = position
+    return queryset.filter(
+        Q(**{f'{field}__{lookup}': value})
+        | Q(**{field: value, f'pk__{lookup}': pk})
+    )
+
+
+class CursorPage(Page):
+    """Страница, открытая по курсору: номер и общее число записей
+    неизвестны, поэтому соседние страницы определяются по выборке."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CursorPaginator(Paginator):
+    """Paginator с ключевой навигацией по паре (поле даты, pk).
+
+    Номера страниц (?page=) работают как раньше через OFFSET,
+    а переходы «вперед/назад» идут по курсору: запрос сводится
+    к диапазонному чтению индекса и не зависит от глубины страницы.
+    Поле сортировки может лежать в связанной таблице
+    (например, '-timeline_entries__pub_date').
+    """
+
+    # Как Paginator.get_elided_page_range из Django 3.2.
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, ordering='-pub_date',
+                 count_scope=None, **kwargs):
+        self.descending = ordering.startswith('-')
+        self.count_scope = count_scope
+        object_list, self.field = order_for_keyset(object_list, ordering)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        """С count_scope число записей берется из кеша лент
+        (posts.caching.feed_count), иначе считается COUNT(*)."""
+        if self.count_scope is None:
+            return super().count
+        return feed_count(self.object_list, self.count_scope)
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def page(self, number):
+        page = super().page(number)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        self.attach_cursors(page)
+        return page
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Номера страниц для навигации: on_ends с краев и on_each_side
+        вокруг текущей, пропуски — ELLIPSIS. Размер не зависит от числа
+        страниц, поэтому ссылки не разрастаются вместе с лентой."""
+        number = self.validate_number(number)
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+    def unread_page(self, number):
+        """Страница, которая не читает ни записей, ни их числа, пока
+        к ней не обратятся, — когда разметка ленты взята из кеша.
+        Курсоров и списка номеров у нее нет."""
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+    def first_page(self):
+        """Первая страница без подсчета общего числа записей."""
+        object_list = list(self.object_list[:self.per_page + 1])
+        page = CursorPage(object_list[:self.per_page], self,
+                          len(object_list) > self.per_page, False)
+        self.attach_cursors(page)
+        return page
+
+    def cursor_page(self, cursor, backwards=False):
+        """Страница после курсора (или перед ним при backwards=True).
+
+        Для испорченного курсора и для возврата к началу ленты
+        возвращает None — тогда открывается обычная страница по номеру.
+        """
+        position = decode_cursor(cursor)
+        if position is None:
+            return None
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        queryset = beyond(self.object_list, self.field, position, lookup)
+        if backwards:
+            queryset = queryset.reverse()
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            if not has_more:
+                return None
+            object_list.reverse()
+            page = CursorPage(object_list, self, True, True)
+        else:
+            page = CursorPage(object_list, self, has_more, True)
+        self.attach_cursors(page)
+        return page
+
+    def attach_cursors(self, page):
+        """Добавляет странице курсоры соседних страниц для шаблона."""
+        page.next_cursor = page.previous_cursor = None
+        if page.has_next() and len(page):
+            page.next_cursor = self.cursor_for(page[len(page) - 1])
+        if page.has_previous() and len(page):
+            page.previous_cursor = self.cursor_for(page[0])
+
+
+def paginate(request, queryset, per_page=None, ordering='-pub_date',
+             count_scope=None, unread=False):
+    """Возвращает страницу ленты по параметрам запроса.
+
+    ?after= и ?before= открывают страницу по курсору,
+    ?page= остается запасным вариантом с номером страницы.
+    С unread=True страница по номеру не читается из базы
+    (см. CursorPaginator.unread_page).
+    """
+    paginator = CursorPaginator(
+        queryset, per_page or settings.POSTS_PER_PAGE, ordering, count_scope
+    )
+    if unread:
+        return paginator.unread_page(int(request.GET.get('page', 1)))
+    for param, backwards in (('after', False), ('before', True)):
+        cursor = request.GET.get(param)
+        if cursor:
+            page = paginator.cursor_page(cursor, backwards)
+            if page is not None:
+                return page
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,343 @@
+"""Полнотекстовый поиск по постам.
+
+Текст постов хранится в таблице SQLite FTS5 в виде основ слов:
+встроенные токенизаторы FTS5 не умеют русскую морфологию, поэтому
+слова приводятся к основе стеммером Snowball до записи в индекс
+и перед поиском. Индекс обновляется сигналами при сохранении и
+удалении постов; пересобрать его целиком можно командой
+rebuild_search_index. На других СУБД поиск откатывается к
+icontains без ранжирования.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_search'
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+
+def _regions(word):
+    """Начала областей RV и R2 алгоритма Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(rv_part, endings, after_a=False):
+    """Отрезает самое длинное окончание; для групп, которые по
+    правилам должны следовать за «а» или «я», буква остается."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if rv_part.endswith(ending):
+            stem = rv_part[:-len(ending)]
+            if after_a and not stem.endswith(('а', 'я')):
+                continue
+            return stem
+    return None
+
+
+def _strip_groups(rv_part, groups):
+    first, second = groups
+    stripped = [
+        stem for stem in (_strip(rv_part, first, after_a=True),
+                          _strip(rv_part, second))
+        if stem is not None
+    ]
+    return min(stripped, key=len) if stripped else None
+
+
+def _strip_endings(part):
+    """Шаг 1: деепричастие, иначе возвратная частица и окончание
+    прилагательного, глагола или существительного."""
+    stripped = _strip_groups(part, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    reflexive = _strip(part, REFLEXIVE)
+    if reflexive is not None:
+        part = reflexive
+    for attempt in (_adjectival, _verb, _noun):
+        stripped = attempt(part)
+        if stripped is not None:
+            return stripped
+    return part
+
+
+def _strip_derivational(part, r2_start):
+    """Шаг 3: словообразовательный суффикс, если он лежит в R2."""
+    for ending in DERIVATIONAL:
+        if part.endswith(ending) and len(part) - len(ending) >= r2_start:
+            return part[:-len(ending)]
+    return part
+
+
+def _tidy_up(part):
+    """Шаг 4: «нн» в «н», превосходная степень, мягкий знак."""
+    if part.endswith('нн'):
+        return part[:-1]
+    superlative = _strip(part, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    if part.endswith('ь'):
+        return part[:-1]
+    return part
+
+
+# Словарь текстов невелик по сравнению с их объемом, поэтому
+# основы запоминаются: при пересборке индекса это в разы быстрее.
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа русского слова по алгоритму Snowball."""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.search(word):
+        return word
+    rv, r2 = _regions(word)
+    prefix, part = word[:rv], _strip_endings(word[rv:])
+    if part.endswith('и'):
+        part = part[:-1]
+    part = _strip_derivational(part, max(r2 - rv, 0))
+    return prefix + _tidy_up(part)
+
+
+def _adjectival(part):
+    stem_ = _strip(part, ADJECTIVE)
+    if stem_ is None:
+        return None
+    participle = _strip_groups(stem_, PARTICIPLE)
+    return stem_ if participle is None else participle
+
+
+def _verb(part):
+    return _strip_groups(part, VERB)
+
+
+def _noun(part):
+    return _strip(part, NOUN)
+
+
+def normalize(text):
+    """Текст, приведенный к основам слов, для записи в индекс."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы из запроса, каждая как префикс."""
+    return ' '.join(
+        f'"{stem(word)}"*' for word in WORD_RE.findall(query)
+    )
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk]
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)',
+            [post.pk, normalize(post.text)]
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild(batch_size=2000, after=None):
+    """Пересобирает поисковый индекс по всем постам
+    или, если задан after, только по постам с id больше него."""
+    if not is_available():
+        return 0
+    indexed = 0
+    # Одна транзакция вместо отдельной на каждую вставленную строку.
+    with transaction.atomic(), connection.cursor() as cursor:
+        rows = Post.objects.order_by().values_list('pk', 'text')
+        if after is None:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        else:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid > %s', [after]
+            )
+            rows = rows.filter(pk__gt=after)
+        batch = []
+        for pk, text in rows.iterator(chunk_size=batch_size):
+            batch.append((pk, normalize(text)))
+            if len(batch) == batch_size:
+                cursor.executemany(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, body) '
+                    f'VALUES (%s, %s)', batch
+                )
+                indexed += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)',
+                batch
+            )
+            indexed += len(batch)
+    return indexed
+
+
+def fill_after_migrate(sender, using, **kwargs):
+    """Обработчик post_migrate: миграция только создает таблицу
+    индекса, а заполняется она здесь, если индекс пуст, а посты есть.
+    Так после первого деплоя поиск сразу находит старые посты."""
+    # rebuild() пишет через основное соединение.
+    if using != DEFAULT_DB_ALIAS or not is_available():
+        return
+    if SEARCH_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {SEARCH_TABLE} LIMIT 1')
+        if cursor.fetchone() is not None:
+            return
+    if Post.objects.exists():
+        rebuild()
+
+
+def filter_queryset(queryset, query):
+    """Оставляет в queryset посты, найденные по запросу (без ранжирования)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [expression]
+    ))
+
+
+def encode_cursor(rank, pk):
+    return f'{rank!r}_{pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        rank, pk = cursor.split('_')
+        return float(rank), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class SearchResults:
+    """Страница результатов поиска, упорядоченных по релевантности."""
+
+    def __init__(self, posts, next_cursor):
+        self.posts = posts
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.posts)
+
+    def __len__(self):
+        return len(self.posts)
+
+
+def search_posts(query, group=None, author=None, cursor=None, limit=None):
+    """Ищет посты по запросу с фильтрами по группе и автору.
+
+    Результаты отсортированы по bm25 и листаются по курсору
+    (ранг, id) — глубина страницы не влияет на стоимость запроса.
+    """
+    limit = limit or settings.POSTS_PER_PAGE
+    expression = match_expression(query)
+    if not expression:
+        return SearchResults([], None)
+    if not is_available():
+        posts = Post.objects.with_related().filter(text__icontains=query)
+        if group is not None:
+            posts = posts.filter(group=group)
+        if author is not None:
+            posts = posts.filter(author=author)
+        return SearchResults(list(posts[:limit]), None)
+
+    conditions = [f'{SEARCH_TABLE} MATCH %s']
+    params = [expression]
+    if group is not None:
+        conditions.append('post.group_id = %s')
+        params.append(group.pk)
+    if author is not None:
+        conditions.append('post.author_id = %s')
+        params.append(author.pk)
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        conditions.append(
+            f'({SEARCH_TABLE}.rank > %s '
+            f'OR ({SEARCH_TABLE}.rank = %s AND post.id > %s))'
+        )
+        params.extend([position[0], position[0], position[1]])
+    table = Post._meta.db_table
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            f'SELECT post.id, {SEARCH_TABLE}.rank FROM {SEARCH_TABLE} '
+            f'JOIN {table} AS post ON post.id = {SEARCH_TABLE}.rowid '
+            f'WHERE {" AND ".join(conditions)} '
+            f'ORDER BY {SEARCH_TABLE}.rank, post.id LIMIT %s',
+            [*params, limit + 1]
+        )
+        hits = db_cursor.fetchall()
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor(hits[-1][1], hits[-1][0])
+    posts = Post.objects.with_related().in_bulk([pk for pk, _ in hits])
+    return SearchResults([posts[pk] for pk, _ in hits if pk in posts],
+                         next_cursor)
@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, media, search, timeline
+from .caching import (bump_feed_version, bump_follow_versions,
+                      forget_feed_count)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся в карточках постов.
+DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_state(sender, instance, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    if instance.pk is not None:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change_group(instance._saved_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, create=False, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, create=False,
+                         following_count=-1)
+    counters.change_user(instance.author_id, create=False,
+                         followers_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def retain_image(sender, instance, created, **kwargs):
+    if instance._saved_image != instance.image.name:
+        media.retain(instance.image.name)
+        media.release(instance._saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    # loaddata (raw) не раскладывает посты: ленты пересобирает
+    # rebuild_timelines.
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    # Посты и группы меняют версию лент, а подписка — только
+    # ленту подписок одного пользователя и число постов в ней.
+    forget_feed_count(timeline.follow_count_scope(instance.user_id))
+    bump_follow_versions([f'user:{instance.user_id}'])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_followers_feeds(sender, instance, **kwargs):
+    timeline.invalidate_follow_caches(instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_all_follow_feeds(sender, **kwargs):
+    bump_follow_versions(['all'])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_feeds_on_rename(sender, instance, created,
+                               update_fields=None, **kwargs):
+    # Вход в систему сохраняет только last_login — ленты не меняются.
+    if update_fields is None or DISPLAY_FIELDS & set(update_fields):
+        bump_feed_version()
+        if not created:
+            timeline.invalidate_follow_caches(instance.pk)
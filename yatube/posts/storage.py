@@ -0,0 +1,114 @@
+"""Адресуемое по содержимому хранилище картинок постов.
+
+Файл сохраняется под именем sha256 своего содержимого и раскладывается
+по вложенным каталогам: posts/ab/cd/abcd….jpg. В одном каталоге
+не оказывается миллионов файлов, а одинаковые картинки хранятся один
+раз. Сколько постов ссылается на файл, учитывает модель MediaBlob
+(см. posts/media.py); файл удаляется, когда ссылок не осталось.
+Для ImageField и sorl-thumbnail это обычный FileSystemStorage:
+меняется только имя, которое возвращает save().
+"""
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # Временные файлы пишутся внутри MEDIA_ROOT, чтобы os.replace
+    # переносил их в шард без копирования.
+    incoming_dir = '.incoming'
+
+    @staticmethod
+    def hashed_name(directory, digest, extension):
+        return posixpath.join(directory, digest[:2], digest[2:4],
+                              digest + extension.lower())
+
+    @staticmethod
+    def is_hashed(name):
+        return bool(HASHED_NAME_RE.search(name))
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяет содержимое, суффиксы не нужны.
+        return name
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+        old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(directory, self.directory_permissions_mode,
+                        exist_ok=True)
+        finally:
+            os.umask(old_umask)
+
+    def _place(self, source_path, name):
+        """Переносит файл в шард, если такого содержимого еще нет."""
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(source_path)
+            return
+        self._makedirs(os.path.dirname(full_path))
+        # Параллельная запись того же содержимого безопасна: replace
+        # атомарен, а байты у обоих файлов одинаковые.
+        os.replace(source_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        incoming = self.path(self.incoming_dir)
+        self._makedirs(incoming)
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = self.hashed_name(directory, digest.hexdigest(),
+                                    os.path.splitext(filename)[1])
+            self._place(temp_path, name)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def adopt(self, name):
+        """Добавляет уже лежащий в хранилище файл под адресуемым именем.
+
+        Файл не копируется, а получает жесткую ссылку; старое имя
+        остается, пока его явно не удалят.
+        """
+        full_path = self.path(name)
+        digest = hashlib.sha256()
+        with open(full_path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        directory, filename = posixpath.split(name)
+        new_name = self.hashed_name(directory, digest.hexdigest(),
+                                    os.path.splitext(filename)[1])
+        if not self.exists(new_name):
+            incoming = self.path(self.incoming_dir)
+            self._makedirs(incoming)
+            fd, temp_path = tempfile.mkstemp(dir=incoming)
+            os.close(fd)
+            os.remove(temp_path)
+            try:
+                os.link(full_path, temp_path)
+            except OSError:
+                # Файловая система без жестких ссылок.
+                shutil.copyfile(full_path, temp_path)
+            self._place(temp_path, new_name)
+        return new_name
@@ -0,0 +1,124 @@
+"""RSS и Atom-ленты постов группы и автора.
+
+Читалки лент опрашивают их часто, а меняются ленты только вместе
+с постами, поэтому готовый XML хранится в кеше с версией лент
+в ключе (posts.caching): сохранение или удаление поста, правка
+группы или имени автора меняют версию, и лента строится заново
+ровно один раз — при следующем запросе. ETag и Last-Modified
+считаются без запросов к базе, так что повторный опрос обычно
+получает 304.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr, truncatechars
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .caching import feed_version
+from .conditional import feed_last_modified, public_etag
+from .models import Group, User
+
+
+class PostsFeed(Feed):
+    """Общая часть лент: последние посты с автором и группой."""
+
+    def item_title(self, post):
+        return truncatechars(post.text, 80)
+
+    def item_description(self, post):
+        return linebreaksbr(post.text)
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+    def latest(self, posts):
+        return posts.with_related()[:settings.SYNDICATION_ITEMS]
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return self.latest(group.posts)
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Записи пользователя {author.get_full_name() or author}'
+
+    def description(self, author):
+        return self.title(author)
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return self.latest(author.posts)
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def cache_key(request):
+    # В XML абсолютные ссылки: схема и хост входят в ключ.
+    url = request.build_absolute_uri(request.path)
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'posts:syndication:{feed_version()}:{digest}'
+
+
+def cached(feed):
+    """Представление, которое отдает XML ленты из кеша."""
+    @cache_control(public=True, max_age=settings.SYNDICATION_MAX_AGE)
+    @condition(etag_func=public_etag, last_modified_func=feed_last_modified)
+    def view(request, **kwargs):
+        key = cache_key(request)
+        content = cache.get(key)
+        if content is None:
+            response = feed(request, **kwargs)
+            content = (response.content, response['Content-Type'])
+            cache.set(key, content, settings.FEED_CACHE_TIMEOUT)
+        body, content_type = content
+        return HttpResponse(body, content_type=content_type)
+    return view
+
+
+group_rss = cached(GroupFeed())
+group_atom = cached(GroupAtomFeed())
+author_rss = cached(AuthorFeed())
+author_atom = cached(AuthorAtomFeed())
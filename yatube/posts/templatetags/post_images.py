@@ -0,0 +1,25 @@
+import logging
+
+from django import template
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts.thumbnails import picture
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, profile='feed'):
+    """Адаптивная картинка поста: <picture> со srcset по профилю."""
+    if not image:
+        return {}
+    try:
+        return {'picture': picture(image, profile)}
+    except Exception:
+        # Как и тег thumbnail: битая картинка не должна ронять страницу.
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось построить миниатюры для %s', image)
+        return {}
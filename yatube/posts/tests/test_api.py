@@ -0,0 +1,99 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {i}')
+            for i in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.comments = [
+            Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                                   text=f'Комментарий {i}')
+            for i in range(3)
+        ]
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def walk(self, url, client=None, key=None):
+        """Собирает id всех записей, листая по курсору next."""
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['after'] = cursor
+            data = self.get_json(url, client, **params)
+            page = data[key] if key else data
+            ids.extend(item['id'] for item in page['results'])
+            cursor = page['next']
+            if cursor is None:
+                return ids
+
+    def test_feeds_walk_all_posts_newest_first(self):
+        """Ленты API листаются курсором от новых постов к старым."""
+        expected = [post.pk for post in reversed(self.posts)]
+        follower = Client()
+        follower.force_login(self.reader)
+        urls = {
+            reverse('posts:api_index'): None,
+            reverse('posts:api_group_posts', args=[self.group.slug]): None,
+            reverse('posts:api_profile', args=[self.author.username]): None,
+            reverse('posts:api_follow_index'): follower,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url, client), expected)
+
+    def test_post_fields(self):
+        data = self.get_json(reverse('posts:api_index'), limit=1)
+        post = self.posts[-1]
+        self.assertEqual(data['results'], [{
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': data['results'][0]['pub_date'],
+            'author': self.author.username,
+            'group': self.group.slug,
+            'image': None,
+            'comments_count': 0,
+        }])
+
+    def test_post_detail_pages_comments_oldest_first(self):
+        url = reverse('posts:api_post_detail', args=[self.posts[0].pk])
+        data = self.get_json(url)
+        self.assertEqual(data['post']['id'], self.posts[0].pk)
+        self.assertEqual(data['post']['comments_count'], 3)
+        self.assertEqual(self.walk(url, key='comments'),
+                         [comment.pk for comment in self.comments])
+
+    def test_errors(self):
+        urls = {
+            reverse('posts:api_group_posts', args=['missing']): 404,
+            reverse('posts:api_profile', args=['missing']): 404,
+            reverse('posts:api_post_detail', args=[0]): 404,
+            reverse('posts:api_follow_index'): 401,
+        }
+        for url, status in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status)
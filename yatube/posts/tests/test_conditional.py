@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ConditionalGetTest.reader)
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_unchanged_feed_answers_not_modified(self):
+        """Повторный запрос ленты с тем же ETag получает 304
+        без запросов к постам."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        # Только чтение сессии и пользователя.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_new_post_changes_feed_validators(self):
+        url = reverse('posts:group_list', args=[self.group.slug])
+        guest = Client()
+        response = guest.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.revalidate(url, response, guest).status_code, 304
+            )
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        self.assertEqual(self.revalidate(url, response, guest).status_code,
+                         200)
+
+    def test_new_comment_changes_post_validators(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code, 304)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет кнопку и счетчики — и ETag профиля."""
+        url = reverse('posts:profile', args=[self.author.username])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response, Client()).status_code,
+                         200)
@@ -0,0 +1,138 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.counters import user_counters
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(CountersTest.reader)
+
+    def test_counters_follow_writes(self):
+        """Счетчики обновляются при записи постов, комментариев
+        и подписок."""
+        post = Post.objects.create(author=CountersTest.author,
+                                   text='Текст', group=CountersTest.group)
+        Comment.objects.create(post=post, author=CountersTest.reader,
+                               text='Комментарий')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', args=[CountersTest.author.username]))
+        post.refresh_from_db()
+        CountersTest.group.refresh_from_db()
+        author = user_counters(CountersTest.author.pk)
+        reader = user_counters(CountersTest.reader.pk)
+
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(CountersTest.group.posts_count, 1)
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(reader.following_count, 1)
+
+        post.group = CountersTest.other_group
+        post.save()
+        CountersTest.other_group.refresh_from_db()
+        self.assertEqual(CountersTest.other_group.posts_count, 1)
+
+        post.delete()
+        Follow.objects.filter(user=CountersTest.reader).delete()
+        author.refresh_from_db()
+        reader.refresh_from_db()
+        CountersTest.other_group.refresh_from_db()
+
+        self.assertEqual(CountersTest.other_group.posts_count, 0)
+        self.assertEqual(author.posts_count, 0)
+        self.assertEqual(author.followers_count, 0)
+        self.assertEqual(reader.following_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(author=CountersTest.author,
+                                   text='Текст', group=CountersTest.group)
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        Group.objects.filter(pk=CountersTest.group.pk).update(posts_count=7)
+        UserCounters.objects.filter(user=CountersTest.author).update(
+            posts_count=3)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        CountersTest.group.refresh_from_db()
+
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(CountersTest.group.posts_count, 1)
+        self.assertEqual(user_counters(CountersTest.author.pk).posts_count, 1)
+
+    def test_profile_uses_counters(self):
+        """Профиль показывает число постов из счетчика."""
+        Post.objects.create(author=CountersTest.author, text='Текст')
+        response = self.reader_client.get(reverse(
+            'posts:profile', args=[CountersTest.author.username]))
+
+        self.assertEqual(response.context['counters'].posts_count, 1)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_delete_author_with_posts_and_followers(self):
+        """Удаление автора с постами и подписчиками не создает заново
+        его строку счетчиков."""
+        author = User.objects.create_user(username='leaving')
+        Post.objects.create(author=author, text='Текст',
+                            group=CountersTest.group)
+        Follow.objects.create(user=CountersTest.reader, author=author)
+        Follow.objects.create(user=author, author=CountersTest.author)
+        author_id = author.pk
+        user_counters(author_id)
+
+        author.delete()
+
+        self.assertFalse(UserCounters.objects.filter(
+            user_id=author_id).exists())
+        self.assertEqual(
+            user_counters(CountersTest.reader.pk).following_count, 0)
+        self.assertEqual(
+            user_counters(CountersTest.author.pk).followers_count, 0)
+
+    def test_drifted_counters_do_not_go_below_zero(self):
+        """Удаление не падает, если счетчик разошелся и уже равен нулю."""
+        post = Post.objects.create(author=CountersTest.author,
+                                   text='Текст', group=CountersTest.group)
+        comment = Comment.objects.create(post=post, author=CountersTest.reader,
+                                         text='Комментарий')
+        follow = Follow.objects.create(user=CountersTest.reader,
+                                       author=CountersTest.author)
+        UserCounters.objects.update(posts_count=0, followers_count=0,
+                                    following_count=0)
+        Group.objects.update(posts_count=0)
+        Post.objects.update(comments_count=0)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+
+        author = user_counters(CountersTest.author.pk)
+        CountersTest.group.refresh_from_db()
+        self.assertEqual(author.posts_count, 0)
+        self.assertEqual(author.followers_count, 0)
+        self.assertEqual(CountersTest.group.posts_count, 0)
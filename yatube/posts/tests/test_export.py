@@ -0,0 +1,77 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.old_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Старый пост'
+        )
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        cls.post = Post.objects.create(author=cls.author, text='Новый пост')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+    def read(self, name):
+        with gzip.open(os.path.join(self.output, name), 'rt',
+                       encoding='utf-8') as source:
+            return source.read()
+
+    def test_jsonl_export_since_watermark(self):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        call_command('export_data', self.output, since=since,
+                     stdout=StringIO())
+        posts = [json.loads(line)
+                 for line in self.read('posts.jsonl.gz').splitlines()]
+        self.assertEqual([post['text'] for post in posts], ['Новый пост'])
+        self.assertEqual(posts[0]['author'], 'author')
+        comments = self.read('comments.jsonl.gz').splitlines()
+        self.assertEqual(len(comments), 1)
+        follows = [json.loads(line)
+                   for line in self.read('follows.jsonl.gz').splitlines()]
+        self.assertEqual(follows, [{'user': 'reader', 'author': 'author'}])
+
+    def test_csv_export_can_be_imported(self):
+        call_command('export_data', self.output, format='csv',
+                     tables=['posts'], stdout=StringIO())
+        rows = list(csv.DictReader(StringIO(self.read('posts.csv.gz'))))
+        self.assertEqual(len(rows), 2)
+        pub_date = Post.objects.get(pk=self.old_post.pk).pub_date
+        Post.objects.all().delete()
+        call_command('import_posts',
+                     os.path.join(self.output, 'posts.csv.gz'),
+                     stdout=StringIO(), stderr=StringIO())
+        imported = Post.objects.get(text='Старый пост')
+        self.assertEqual(imported.pub_date, pub_date)
+        self.assertEqual(imported.group, self.group)
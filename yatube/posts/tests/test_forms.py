@@ -92,7 +92,8 @@ class PostFormTests(TestCase):
         self.assertEqual(last_object.text, form_data['text'])
         self.assertEqual(last_object.author, form_data['author'])
         self.assertEqual(last_object.group.id, form_data['group'])
-        self.assertEqual(last_object.image.name, 'posts/small.gif')
+        self.assertRegex(last_object.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
 
     def test_create_edit_posts(self):
         """Валидная форма изменяет запись в Post"""
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from posts.images import ingest
+
+ORIENTATION = 0x0112
+
+
+def upload(name, size, mode='RGB', format_='JPEG', **save_options):
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, format_, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(POST_IMAGE_MAX_SIZE=(200, 200))
+class IngestTest(SimpleTestCase):
+    def test_oversized_image_is_downscaled(self):
+        """Большая картинка уменьшается до POST_IMAGE_MAX_SIZE
+        и пересохраняется прогрессивным JPEG."""
+        result = ingest(upload('photo.png', (1000, 500), format_='PNG'))
+        self.assertEqual(result.name, 'photo.jpg')
+        with Image.open(result) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (200, 100))
+            self.assertTrue(image.info.get('progressive'))
+
+    def test_exif_is_applied_and_stripped(self):
+        """Поворот из EXIF применяется, сами метаданные удаляются."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        result = ingest(upload('photo.jpg', (150, 100), exif=exif))
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (100, 150))
+            self.assertNotIn('exif', image.info)
+
+    def test_transparency_is_kept(self):
+        result = ingest(upload('logo.png', (50, 50), 'RGBA', 'PNG'))
+        with Image.open(result) as image:
+            self.assertIn(image.format, ('PNG', 'WEBP'))
+            self.assertEqual(image.mode, 'RGBA')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10_000)
+    def test_too_many_pixels_rejected(self):
+        """Размер проверяется по заголовку, до декодирования."""
+        with self.assertRaises(ValidationError):
+            ingest(upload('huge.png', (200, 200), format_='PNG'))
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_file_rejected(self):
+        with self.assertRaises(ValidationError):
+            ingest(upload('photo.jpg', (100, 100)))
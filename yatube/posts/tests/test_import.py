@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Follow, Group, Post, TimelineEntry
+from posts.search import search_posts
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def write(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(lambda: [os.remove(os.path.join(directory, name)),
+                                 os.rmdir(directory)])
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def import_posts(self, path, *args):
+        call_command('import_posts', path, *args, batch_size=2,
+                     stdout=StringIO(), stderr=StringIO())
+
+    def test_jsonl_import_keeps_dates_and_updates_denormalized_data(self):
+        rows = [
+            {'text': 'Старый пост про котов', 'author': 'author',
+             'group': 'test-slug', 'pub_date': '2015-03-01T10:00:00'},
+            {'text': 'Второй пост', 'author': 'author',
+             'pub_date': '2015-03-02T10:00:00+00:00'},
+            {'text': 'Пост без автора', 'author': 'nobody'},
+        ]
+        lines = [json.dumps(row) for row in rows]
+        lines[1:1] = ['{"text": "Оборванная строка', '[1, 2]', 'null']
+        path = self.write('posts.jsonl', '\n'.join(lines))
+        self.import_posts(path)
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(posts.count(), 2)
+        self.assertEqual(
+            posts.last().pub_date,
+            datetime(2015, 3, 1, 10, tzinfo=timezone.utc)
+        )
+        self.author.counters.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 2)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(len(search_posts('коты')), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+    def test_csv_import_can_create_missing_authors_and_groups(self):
+        path = self.write(
+            'posts.csv',
+            'text,author,group,pub_date\n'
+            'Пост,newcomer,new-group,2016-01-01 00:00:00\n'
+        )
+        self.import_posts(path, '--create-missing')
+        post = Post.objects.get(author__username='newcomer')
+        self.assertEqual(post.group.slug, 'new-group')
+        self.assertEqual(post.pub_date.year, 2016)
+
+    def test_import_rebuilds_only_followers_timelines(self):
+        other = User.objects.create_user(username='other')
+        outsider = User.objects.create_user(username='outsider')
+        Follow.objects.create(user=outsider, author=other)
+        Post.objects.create(author=other, text='Пост другого автора')
+        TimelineEntry.objects.filter(user=outsider).delete()
+        path = self.write('posts.jsonl', json.dumps(
+            {'text': 'Новый пост', 'author': 'author'}
+        ))
+        self.import_posts(path)
+        # Ленту пользователя без подписки на автора импорт не трогает.
+        self.assertFalse(TimelineEntry.objects.filter(user=outsider).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__text='Новый пост').exists())
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько SQL-запросов может выполнить страница авторизованного
+# пользователя (вместе с чтением сессии и пользователя) при 10 постах
+# или комментариях; число не должно зависеть от их количества.
+# В profile и post_detail один запрос уходит на расчет ETag,
+# в follow_index — на ключ кеша ленты и проверку ее длины.
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 3,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:follow_index': 7,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            Post.objects.create(
+                author=cls.authors[i % 3], group=cls.group, text=f'Пост {i}'
+            )
+        cls.post = Post.objects.first()
+        for i in range(10):
+            Comment.objects.create(
+                post=cls.post, author=cls.authors[i % 3], text=f'Коммент {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryBudgetTest.reader)
+
+    def url_for(self, name):
+        kwargs = {
+            'posts:group_list': {'slug': QueryBudgetTest.group.slug},
+            'posts:profile': {
+                'username': QueryBudgetTest.authors[0].username
+            },
+            'posts:post_detail': {'post_id': QueryBudgetTest.post.pk},
+        }
+        return reverse(name, kwargs=kwargs.get(name))
+
+    def test_views_stay_within_query_budget(self):
+        """Страницы укладываются в бюджет SQL-запросов."""
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                cache.clear()
+                with self.assertNumQueries(budget):
+                    self.client.get(self.url_for(name))
+
+    def test_feed_counts_are_cached(self):
+        """COUNT(*) для paginator выполняется один раз на версию лент."""
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:follow_index'):
+            with self.subTest(view=name):
+                self.client.get(self.url_for(name))
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(self.url_for(name))
+                self.assertFalse(any('COUNT(' in query['sql']
+                                     for query in queries))
+                self.assertEqual(response.context['page_obj'].paginator.count,
+                                 12 if name != 'posts:profile' else 4)
+
+    def test_feed_counts_follow_changes(self):
+        """Новый пост и новая подписка сбрасывают закешированное число."""
+        self.client.get(self.url_for('posts:index'))
+        Post.objects.create(author=QueryBudgetTest.reader, text='Новый')
+        response = self.client.get(self.url_for('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+        self.client.get(self.url_for('posts:follow_index'))
+        author = User.objects.create_user(username='new_author')
+        Post.objects.create(author=author, text='Пост нового автора')
+        self.client.get(self.url_for('posts:follow_index'))
+        Follow.objects.create(user=QueryBudgetTest.reader, author=author)
+        response = self.client.get(self.url_for('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+    def test_follow_feed_is_cached_per_user(self):
+        """Закешированная лента подписок не читает посты и их число;
+        пост автора из подписок сбрасывает кеш."""
+        url = self.url_for('posts:follow_index')
+        self.client.get(url)
+        # Сессия, пользователь, авторы для ключа кеша и для выборки.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        Post.objects.create(author=QueryBudgetTest.authors[0],
+                            text='Свежий пост')
+        response = self.client.get(url)
+        self.assertContains(response, 'Свежий пост')
+
+    def test_index_page_is_cached(self):
+        """Закешированная страница главной ленты не читает посты."""
+        url = self.url_for('posts:index')
+        self.client.get(url)
+        # Только сессия и пользователь.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пост 11')
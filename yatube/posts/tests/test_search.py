@@ -0,0 +1,99 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import SEARCH_TABLE, search_posts, stem
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Кошки любят спать. Кошка спала весь день.'
+        )
+        cls.cat = Post.objects.create(
+            author=cls.other_author,
+            text='Про кошку и собаку'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.author,
+            text='Собаки гуляют во дворе'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_stemmer_joins_word_forms(self):
+        """Словоформы сводятся к одной основе."""
+        self.assertEqual(stem('кошками'), stem('кошка'))
+        self.assertEqual(stem('Ёлки'), stem('елка'))
+
+    def test_search_is_ranked_and_morphological(self):
+        """Поиск находит словоформы и ранжирует по релевантности."""
+        results = search_posts('кошками')
+
+        self.assertEqual(list(results),
+                         [SearchTest.cats, SearchTest.cat])
+
+    def test_search_filters(self):
+        """Поиск фильтруется по группе и автору."""
+        self.assertEqual(
+            list(search_posts('кошки', group=SearchTest.group)),
+            [SearchTest.cats]
+        )
+        self.assertEqual(
+            list(search_posts('собака', author=SearchTest.author)),
+            [SearchTest.dogs]
+        )
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        SearchTest.dogs.text = 'Теперь здесь про попугаев'
+        SearchTest.dogs.save()
+
+        self.assertEqual(list(search_posts('попугай')), [SearchTest.dogs])
+        self.assertEqual(list(search_posts('собака')), [SearchTest.cat])
+
+        SearchTest.dogs.delete()
+        self.assertEqual(list(search_posts('попугай')), [])
+
+    def test_empty_index_is_filled_after_migrate(self):
+        """После migrate пустой индекс заполняется существующими постами."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        self.assertEqual(len(search_posts('собака')), 0)
+
+        post_migrate.send(sender=apps.get_app_config('posts'),
+                          app_config=apps.get_app_config('posts'),
+                          verbosity=0, interactive=False, using='default')
+
+        self.assertEqual(len(search_posts('собака')), 2)
+
+    def test_search_view_paginates_by_cursor(self):
+        """Страница поиска листается по курсору."""
+        url = reverse('posts:search')
+        response = self.guest_client.get(url, {'q': 'кошка'})
+        first_page = list(response.context['results'])
+
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(first_page, [SearchTest.cats, SearchTest.cat])
+
+        first = search_posts('кошка', limit=1)
+        second = search_posts('кошка', limit=1, cursor=first.next_cursor)
+        self.assertEqual(list(first) + list(second), first_page)
+        self.assertIsNone(second.next_cursor)
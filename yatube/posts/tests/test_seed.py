@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import counters
+from posts.models import Comment, Follow, Post, TimelineEntry
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, prefix):
+        call_command('seed', users=30, groups=3, posts=200, image_pool=2,
+                     image_share=0.5, batch_size=50, prefix=prefix,
+                     stdout=StringIO())
+        posts = Post.objects.filter(author__username__startswith=prefix)
+        return [
+            (text, author[len(prefix):], image, comments)
+            for text, author, image, comments in posts.order_by('pk')
+            .values_list('text', 'author__username', 'image',
+                         'comments_count')
+        ]
+
+    def test_same_seed_gives_same_data(self):
+        first = self.seed('a')
+        self.assertEqual(len(first), 200)
+        self.assertEqual(first, self.seed('b'))
+
+    def test_denormalized_data_is_consistent(self):
+        self.seed('a')
+        self.assertEqual(counters.reconcile(), 0)
+        self.assertEqual(Comment.objects.count(),
+                         sum(Post.objects.values_list('comments_count',
+                                                      flat=True)))
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import media
+from posts.models import MediaBlob, Post
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, content=b'picture', name='picture.jpg'):
+        post = Post(author=self.author, text='Пост с картинкой')
+        post.image.save(name, ContentFile(content))
+        return post
+
+    def test_identical_images_stored_once(self):
+        """Одинаковое содержимое хранится в одном файле с двумя ссылками."""
+        first = self.create_post(name='first.jpg')
+        second = self.create_post(name='second.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(media.storage.is_hashed(first.image.name))
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+        other = self.create_post(b'other picture')
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        # В TestCase транзакция не коммитится, вызываем удаление сами.
+        media._delete_unreferenced(name)
+        self.assertFalse(media.storage.exists(name))
+
+    def test_replaced_image_released(self):
+        post = self.create_post()
+        old_name = post.image.name
+        post.image.save('new.jpg', ContentFile(b'new picture'))
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_migrate_media_moves_legacy_files(self):
+        """Команда переносит старые файлы и пересчитывает ссылки."""
+        legacy = os.path.join(MEDIA_ROOT, 'posts', 'legacy.jpg')
+        os.makedirs(os.path.dirname(legacy), exist_ok=True)
+        with open(legacy, 'wb') as file:
+            file.write(b'legacy picture')
+        posts = [
+            Post.objects.create(author=self.author, text='Старый пост',
+                                image='posts/legacy.jpg')
+            for _ in range(2)
+        ]
+        call_command('migrate_media', stdout=StringIO())
+        name = Post.objects.get(pk=posts[0].pk).image.name
+        self.assertTrue(media.storage.is_hashed(name))
+        self.assertEqual(Post.objects.filter(image=name).count(), 2)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 2)
+        self.assertFalse(os.path.exists(legacy))
+        with media.storage.open(name) as file:
+            self.assertEqual(file.read(), b'legacy picture')
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_feeds_list_posts(self):
+        urls = {
+            reverse('posts:group_rss', args=[self.group.slug]): 'rss',
+            reverse('posts:group_atom', args=[self.group.slug]): 'atom',
+            reverse('posts:author_rss', args=[self.author.username]): 'rss',
+            reverse('posts:author_atom',
+                    args=[self.author.username]): 'atom',
+        }
+        for url, kind in urls.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(kind, response['Content-Type'])
+                self.assertContains(response, 'Тестовый пост')
+                self.assertTrue(response.has_header('ETag'))
+
+    def test_feed_is_built_once_per_change(self):
+        url = reverse('posts:group_rss', args=[self.group.slug])
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(url)
+            not_modified = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, 'Новый пост')
+
+    def test_feed_links_follow_host(self):
+        url = reverse('posts:group_rss', args=[self.group.slug])
+        self.guest_client.get(url)
+        response = self.guest_client.get(url, HTTP_HOST='localhost',
+                                         secure=True)
+        self.assertContains(response, 'https://localhost/')
+        self.assertNotContains(response, 'testserver')
+
+    def test_unknown_group_feed_is_not_found(self):
+        response = self.guest_client.get(
+            reverse('posts:group_atom', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
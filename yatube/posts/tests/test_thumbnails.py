@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        cls.plain_post = Post.objects.create(
+            author=cls.author, text='Пост без картинки'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def thumbnail_names(self):
+        source = ImageFile(self.post.image)
+        return default.kvstore._get(source.key, identity='thumbnails') or []
+
+    def test_generate_builds_every_geometry(self):
+        """Для картинки строятся миниатюры всех профилей, общие
+        для нескольких профилей — один раз."""
+        done = thumbnails.generate([self.post.pk, self.plain_post.pk])
+        self.assertEqual(done, 1)
+        profile = settings.POST_THUMBNAIL_PROFILES['feed']
+        self.assertEqual(
+            len(self.thumbnail_names()),
+            len(profile['widths']) * len(thumbnails.formats(profile))
+        )
+
+    def test_pending_thumbnails_built_after_response(self):
+        """Поставленные в очередь посты обрабатываются по request_finished."""
+        thumbnails._queue().append(self.post.pk)
+        thumbnails.generate_pending(sender=None)
+        self.assertTrue(self.thumbnail_names())
+        self.assertEqual(thumbnails._queue(), [])
+
+    def test_template_reuses_pregenerated_thumbnail(self):
+        """Тег post_picture берет уже построенные миниатюры."""
+        thumbnails.generate([self.post.pk])
+        built = set(self.thumbnail_names())
+        self.render()
+        self.assertEqual(set(self.thumbnail_names()), built)
+
+    def render(self, profile='feed'):
+        return Template(
+            '{% load post_images %}{% post_picture image profile %}'
+        ).render(Context({'image': self.post.image, 'profile': profile}))
+
+    @override_settings(POST_THUMBNAIL_PROFILES={'feed': {
+        'size': (960, 339),
+        'widths': (320, 960),
+        'formats': ('PNG', 'JPEG'),
+        'sizes': '100vw',
+        'options': {'crop': 'center'},
+    }})
+    def test_picture_lists_widths_and_formats(self):
+        """Каждый формат — отдельный srcset, запасной формат — в <img>."""
+        html = self.render()
+        self.assertEqual(html.count('<source type="image/png"'), 1)
+        self.assertIn('.png 320w', html)
+        self.assertIn('.png 960w', html)
+        self.assertRegex(html, r'<img [^>]*srcset="[^"]+\.jpg 320w, '
+                               r'[^"]+\.jpg 960w"')
+        self.assertIn('sizes="100vw"', html)
+
+    def test_post_without_image_renders_nothing(self):
+        html = Template(
+            '{% load post_images %}{% post_picture post.image %}'
+        ).render(Context({'post': self.plain_post}))
+        self.assertEqual(html.strip(), '')
@@ -4,12 +4,17 @@ import shutil
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core import serializers
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Comment, Follow, Group, Post
+from posts import timeline
+from posts.caching import FOLLOW_VERSION_KEY, bump_feed_version
+from posts.counters import user_counters
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 
@@ -61,6 +66,49 @@ class CommentTest(TestCase):
             CommentTest.comment.author)
 
 
+@override_settings(COMMENTS_FIRST_PAGE=2, COMMENTS_PER_PAGE=3)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text=f'Комментарий {i}')
+            for i in range(6)
+        ]
+
+    def test_post_detail_shows_first_comments(self):
+        """На странице поста только первые комментарии, по порядку."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:2])
+        self.assertTrue(comments.next_cursor)
+        self.assertContains(response, 'data-fragment')
+
+    def test_load_more_walks_all_comments(self):
+        """«Показать еще» по курсору догружает остальные комментарии."""
+        url = reverse('posts:comments', args=[self.post.pk])
+        cursor = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments'].next_cursor
+        loaded = []
+        while cursor:
+            response = self.client.get(url, {'after': cursor})
+            self.assertTemplateUsed(response,
+                                    'posts/includes/comment_list.html')
+            loaded.extend(response.context['comments'])
+            cursor = response.context['comments'].next_cursor
+        self.assertEqual(loaded, self.comments[2:])
+
+    def test_comments_of_missing_post_not_found(self):
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
 @override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR,
                                            'temp_views_test'))
 class PostPagesTests(TestCase):
@@ -242,6 +290,9 @@ class PostPagesTests(TestCase):
             for i in range(batch_size)
         ]
         Post.objects.bulk_create(posts, batch_size)
+        # bulk_create не шлет сигналы: как import_posts и seed,
+        # сбрасываем кеш лент вместе с закешированным числом постов.
+        bump_feed_version()
         count_all_posts = Post.objects.count()
         pages = {
             '?page=1': view_setting_paginator,
@@ -272,12 +323,72 @@ class PostPagesTests(TestCase):
 
                     self.assertEqual(count_objects, count_post_on_page)
 
+    def test_cursor_paginator_walks_feed(self):
+        """Переходы по курсору проходят ленту без пропусков и повторов."""
+        batch_size = 25
+        Post.objects.bulk_create([
+            Post(text=f'Cursor text {i}',
+                 group=PostPagesTests.group_with_post,
+                 author=PostPagesTests.user)
+            for i in range(batch_size)
+        ])
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        url = reverse(
+            'posts:group_list',
+            kwargs={'slug': PostPagesTests.group_with_post.slug}
+        )
+        seen = []
+        response = self.guest_client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            seen.extend(page_obj)
+            if not page_obj.has_next():
+                break
+            response = self.guest_client.get(
+                url, {'after': page_obj.next_cursor}
+            )
+            self.assertIsNone(response.context['page_obj'].number)
+
+        self.assertEqual(seen, expected)
+
+        response = self.guest_client.get(
+            url, {'before': page_obj.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']),
+                         expected[-len(page_obj) - 10:-len(page_obj)])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_paginator_elides_page_links(self):
+        """Навигация выводит края и окно вокруг текущей страницы."""
+        Post.objects.bulk_create([
+            Post(text=f'Elided text {i}', author=PostPagesTests.user)
+            for i in range(30)
+        ])
+        bump_feed_version()
+        num_pages = Post.objects.count()
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'page': 15})
+        page_obj = response.context['page_obj']
+
+        self.assertEqual(
+            page_obj.elided_page_range,
+            [1, 2, '…', *range(12, 19), '…', num_pages - 1, num_pages]
+        )
+        self.assertContains(response, '?page=18"')
+        self.assertNotContains(response, '?page=10"')
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'after': 'broken'})
+
+        self.assertEqual(response.context['page_obj'].number, 1)
+
     def test_index_page_cache(self):
         """Проверка кеширования index page"""
         first_response = self.guest_client.get(reverse('posts:index'))
-        new_post = Post.objects.create(
-            text='Another test publication',
-            author=PostPagesTests.user,
+        Post.objects.filter(pk=PostPagesTests.post.pk).update(
+            text='Changed behind the cache'
         )
 
         last_response = self.guest_client.get(reverse('posts:index'))
@@ -285,11 +396,26 @@ class PostPagesTests(TestCase):
         self.assertEqual(first_response.content, last_response.content,
                          'Проверка кеширования')
 
-        cache.clear()
+        new_post = Post.objects.create(
+            text='Another test publication',
+            author=PostPagesTests.user,
+        )
         response = self.guest_client.get(reverse('posts:index'))
 
-        self.assertIn(new_post, response.context['page_obj'],
-                      'Проверка отчистки кеша')
+        self.assertContains(response, new_post.text,
+                            msg_prefix='Проверка сброса кеша')
+
+    def test_index_page_cache_varies_on_page(self):
+        """Разные страницы index не берутся из одного кеша"""
+        Post.objects.bulk_create([
+            Post(text=f'Page text {i}', author=PostPagesTests.user)
+            for i in range(15)
+        ])
+        first_page = self.guest_client.get(reverse('posts:index'))
+        second_page = self.guest_client.get(reverse('posts:index'),
+                                            {'page': 2})
+
+        self.assertNotEqual(first_page.content, second_page.content)
 
 
 class FollowTest(TestCase):
@@ -307,6 +433,7 @@ class FollowTest(TestCase):
         cls.author_2 = User.objects.create(username='Тестовый автор 2')
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client_1 = Client()
         self.authorized_client_1.force_login(FollowTest.follower)
@@ -324,6 +451,19 @@ class FollowTest(TestCase):
                                             author=FollowTest.author_2).author,
                          FollowTest.author_2)
 
+    def test_repeated_follow_is_ignored(self):
+        """Повторная подписка не создает дубль и не сбивает счетчики."""
+        url = reverse('posts:profile_follow',
+                      args=[FollowTest.author_1.username])
+        response = self.authorized_client_1.get(url)
+        self.assertRedirects(response, reverse(
+            'posts:profile', args=[FollowTest.author_1.username]))
+        self.assertEqual(Follow.objects.filter(
+            user=FollowTest.follower, author=FollowTest.author_1).count(), 1)
+        self.assertEqual(
+            user_counters(FollowTest.author_1.pk).followers_count, 1
+        )
+
     def test_user_cant_follow_author(self):
         """Неавторизованный не может
         подписываться на других пользователей."""
@@ -396,3 +536,94 @@ class FollowTest(TestCase):
                 user=subscribed_user
             ).exists()
         )
+
+    def test_follow_feed_is_materialized(self):
+        """Посты автора раскладываются в ленту подписчика и убираются
+        из нее после отписки."""
+        follower = FollowTest.follower
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follower, post=FollowTest.post).exists())
+
+        new_post = Post.objects.create(author=FollowTest.author_2,
+                                       text='Пост второго автора')
+        self.authorized_client_1.get(reverse(
+            'posts:profile_follow', args=[FollowTest.author_2.username]))
+        response = self.authorized_client_1.get(reverse('posts:follow_index'))
+
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, FollowTest.post])
+
+        self.authorized_client_1.get(reverse(
+            'posts:profile_unfollow', args=[FollowTest.author_2.username]))
+
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=follower, post=new_post).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, TIMELINE_LENGTH=1)
+    def test_follow_feed_reads_popular_authors_directly(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении,
+        а материализованная лента ограничена по длине."""
+        Post.objects.create(author=FollowTest.author_1, text='Новый пост')
+        response = self.authorized_client_1.get(reverse('posts:follow_index'))
+
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertLessEqual(
+            TimelineEntry.objects.filter(user=FollowTest.follower).count(), 1
+        )
+
+    def test_follow_feed_cache_is_targeted(self):
+        """Кеш ленты подписок сбрасывают посты авторов из подписок
+        и подписки пользователя, но не посты остальных авторов."""
+        url = reverse('posts:follow_index')
+        self.authorized_client_1.get(url)
+        Post.objects.create(author=FollowTest.author_2, text='Чужой пост')
+        Post.objects.filter(pk=FollowTest.post.pk).update(text='Без сигнала')
+        # Пост автора не из подписок кеш не трогает.
+        self.assertNotContains(self.authorized_client_1.get(url),
+                               'Без сигнала')
+
+        self.authorized_client_1.get(reverse(
+            'posts:profile_follow', args=[FollowTest.author_2.username]))
+        response = self.authorized_client_1.get(url)
+        self.assertContains(response, 'Чужой пост')
+        self.assertContains(response, 'Без сигнала')
+
+        Post.objects.create(author=FollowTest.author_1, text='Новый пост')
+        self.assertContains(self.authorized_client_1.get(url), 'Новый пост')
+
+    @override_settings(FOLLOW_CACHE_INVALIDATION_LIMIT=0)
+    def test_follow_feed_cache_of_popular_author(self):
+        """Пост автора с множеством подписчиков меняет версию автора,
+        а не версии кеша каждого подписчика."""
+        url = reverse('posts:follow_index')
+        self.authorized_client_1.get(url)
+        key = FOLLOW_VERSION_KEY.format(scope=f'user:{FollowTest.follower.pk}')
+        user_version = cache.get(key)
+
+        Post.objects.create(author=FollowTest.author_1, text='Новый пост')
+
+        self.assertEqual(cache.get(key), user_version)
+        self.assertContains(self.authorized_client_1.get(url), 'Новый пост')
+
+    def test_raw_save_does_not_fan_out(self):
+        """Посты из фикстур (loaddata) не раскладываются по лентам."""
+        data = serializers.serialize('json', [
+            Post(author=FollowTest.author_1, text='Из фикстуры',
+                 pub_date=timezone.now())
+        ])
+        for obj in serializers.deserialize('json', data):
+            obj.save()
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__text='Из фикстуры').exists())
+
+    @override_settings(TIMELINE_LENGTH=1)
+    def test_rebuild_all_matches_fan_out(self):
+        """Пересборка всех лент дает то же, что раскладка при публикации
+        и обрезка при чтении."""
+        Post.objects.create(author=FollowTest.author_1, text='Новый пост')
+        timeline.trim_overflow(FollowTest.follower.pk)
+        expected = list(TimelineEntry.objects.values_list('user', 'post'))
+        timeline.rebuild_all()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')), expected
+        )
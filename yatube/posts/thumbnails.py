@@ -0,0 +1,127 @@
+"""Подготовка миниатюр постов сразу после загрузки картинки.
+
+Картинка поста показывается как <picture> с несколькими ширинами
+и форматами из POST_THUMBNAIL_PROFILES; формат выбирает браузер по
+атрибуту type, поэтому HTML один для всех клиентов и остается
+в кеше фрагментов. Первый просмотр ленты после загрузки платил бы
+за построение всех миниатюр, поэтому они строятся заранее: после
+коммита транзакции пост ставится в очередь, а очередь разбирается
+по сигналу request_finished, то есть когда ответ уже отдан клиенту.
+Команда generate_thumbnails пересобирает миниатюры всех постов
+в пуле процессов.
+"""
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.dispatch import receiver
+from PIL import features
+from sorl.thumbnail import delete, get_thumbnail
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+Source = namedtuple('Source', 'type srcset')
+Picture = namedtuple('Picture', 'sources src srcset sizes width height')
+
+
+def formats(profile):
+    """Форматы профиля, которые умеет сохранять установленный Pillow."""
+    return [
+        format_ for format_ in profile['formats']
+        if format_ != 'WEBP' or features.check('webp')
+    ]
+
+
+def geometries(profile):
+    """Тройки (ширина, геометрия, опции) для всех миниатюр профиля."""
+    for format_ in formats(profile):
+        for step in profile['widths']:
+            geometry = f'{step}x{_height(profile, step)}'
+            yield step, geometry, {**profile['options'], 'format': format_}
+
+
+def _height(profile, step):
+    width, height = profile['size']
+    return round(height * step / width)
+
+
+def generate_for(image, force=False):
+    """Строит все миниатюры картинки, которые нужны шаблонам."""
+    if force:
+        delete(image, delete_file=False)
+    built = set()
+    for profile in settings.POST_THUMBNAIL_PROFILES.values():
+        for _, geometry, options in geometries(profile):
+            key = (geometry, tuple(sorted(options.items())))
+            if key not in built:
+                get_thumbnail(image, geometry, **options)
+                built.add(key)
+
+
+def picture(image, profile_name):
+    """Описание <picture> для картинки поста по профилю."""
+    profile = settings.POST_THUMBNAIL_PROFILES[profile_name]
+    srcsets = {}
+    for step, geometry, options in geometries(profile):
+        url = get_thumbnail(image, geometry, **options).url
+        srcsets.setdefault(options['format'], []).append((url, step))
+    *preferred, fallback = srcsets
+    src, width = srcsets[fallback][-1]
+    return Picture(
+        sources=[Source(MIME_TYPES[format_], _srcset(srcsets[format_]))
+                 for format_ in preferred],
+        src=src,
+        srcset=_srcset(srcsets[fallback]),
+        sizes=profile['sizes'],
+        width=width,
+        height=_height(profile, width),
+    )
+
+
+def _srcset(candidates):
+    return ', '.join(f'{url} {step}w' for url, step in candidates)
+
+
+def generate(post_ids, force=False):
+    """Строит миниатюры для постов; возвращает число обработанных."""
+    done = 0
+    posts = Post.objects.filter(pk__in=post_ids).exclude(image='')
+    for post in posts.only('pk', 'image'):
+        generate_for(post.image, force)
+        done += 1
+    return done
+
+
+def _queue():
+    if not hasattr(_pending, 'post_ids'):
+        _pending.post_ids = []
+    return _pending.post_ids
+
+
+def pregenerate(post):
+    """Ставит построение миниатюр в очередь после коммита транзакции."""
+    if post.image:
+        transaction.on_commit(lambda: _queue().append(post.pk))
+
+
+@receiver(request_finished)
+def generate_pending(sender, **kwargs):
+    post_ids = _queue()
+    if not post_ids:
+        return
+    _pending.post_ids = []
+    try:
+        generate(post_ids)
+    except Exception:
+        # Миниатюра все равно построится при первом показе.
+        logger.exception('Не удалось построить миниатюры постов %s',
+                         post_ids)
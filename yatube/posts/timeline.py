@@ -0,0 +1,243 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в ленты подписчиков автора,
+поэтому страница «Избранные авторы» читается одним диапазоном
+индекса (user, pub_date); до TIMELINE_LENGTH записей лента
+обрезается при чтении. Посты авторов, у которых подписчиков
+больше TIMELINE_FANOUT_LIMIT, не раскладываются, а подмешиваются
+при чтении (fan-out on read).
+
+Первые страницы ленты кешируются с версиями пользователя в ключе
+(follow_cache_key). Пост автора сбрасывает кеш его подписчиков, но
+не больше FOLLOW_CACHE_INVALIDATION_LIMIT: у авторов с большим числом
+подписчиков своя версия, и она входит в ключ каждого подписчика.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .caching import bump_follow_versions, follow_versions
+from .counters import user_counters
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .paginators import paginate
+
+TRIM_BATCH_SIZE = 500
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли посты автора по лентам подписчиков."""
+    followers = user_counters(author_id).followers_count
+    return followers <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def direct_read_authors(user):
+    """Авторы из подписок пользователя, посты которых
+    читаются напрямую, а не из материализованной ленты."""
+    return Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('author')
+
+
+def trim(user_ids):
+    """Обрезает ленты пользователей до TIMELINE_LENGTH записей."""
+    user_ids = list(user_ids)
+    table = TimelineEntry._meta.db_table
+    for start in range(0, len(user_ids), TRIM_BATCH_SIZE):
+        batch = user_ids[start:start + TRIM_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+                f'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+                f') AS position FROM {table} WHERE user_id IN ({placeholders})'
+                f') AS ranked WHERE position > %s)',
+                [*batch, settings.TIMELINE_LENGTH]
+            )
+
+
+def trim_overflow(user_id):
+    """Обрезает ленту, только если она длиннее TIMELINE_LENGTH;
+    проверка — одно чтение индекса со смещением."""
+    overflow = TimelineEntry.objects.filter(user=user_id).values('pk')[
+        settings.TIMELINE_LENGTH:settings.TIMELINE_LENGTH + 1
+    ]
+    if overflow.exists():
+        trim([user_id])
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(author=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    # Ленты обрезаются при чтении (trim_overflow), а не здесь: иначе
+    # каждый пост стоил бы оконного DELETE по лентам всех подписчиков.
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        ignore_conflicts=True
+    )
+
+
+def backfill(user, author_id):
+    """Заполняет ленту последними постами нового автора из подписок."""
+    if not is_fanout_author(author_id):
+        return
+    posts = (
+        Post.objects.filter(author=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user=user, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True
+    )
+    trim([user.pk])
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def rebuild(users):
+    """Пересобирает ленты пользователей с нуля."""
+    for user in users:
+        TimelineEntry.objects.filter(user=user).delete()
+        for follow in Follow.objects.filter(user=user):
+            backfill(user, follow.author_id)
+        bump_follow_versions([f'user:{user.pk}'])
+
+
+def _fill(cursor, where='', params=()):
+    """Одним INSERT ... SELECT кладет в ленты последние TIMELINE_LENGTH
+    постов авторов с раскладкой. Авторы без раскладки определяются,
+    как в direct_read_authors: по счетчику подписчиков. where сужает
+    подписки (псевдоним f)."""
+    table = TimelineEntry._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    counters = UserCounters._meta.db_table
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, post_id, pub_date) '
+        f'SELECT user_id, post_id, pub_date FROM ('
+        f'SELECT f.user_id, p.id AS post_id, p.pub_date, ROW_NUMBER() '
+        f'OVER (PARTITION BY f.user_id ORDER BY p.pub_date DESC, p.id '
+        f'DESC) AS position FROM {follows} AS f '
+        f'JOIN {posts} AS p ON p.author_id = f.author_id '
+        f'LEFT JOIN {counters} AS c ON c.user_id = f.author_id '
+        f'WHERE COALESCE(c.followers_count, 0) <= %s {where}'
+        f') AS ranked WHERE position <= %s',
+        [settings.TIMELINE_FANOUT_LIMIT, *params, settings.TIMELINE_LENGTH]
+    )
+    return cursor.rowcount
+
+
+def rebuild_all():
+    """Пересобирает все ленты одним INSERT ... SELECT: быстрее, чем
+    по пользователю, когда подписок сотни тысяч."""
+    table = TimelineEntry._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        rows = _fill(cursor)
+    bump_follow_versions(['all'])
+    return rows
+
+
+def rebuild_followers(author_ids):
+    """Пересобирает ленты только подписчиков указанных авторов —
+    например, после импорта постов, при котором сигналы не вызывались.
+    Пользователи обрабатываются пачками по TRIM_BATCH_SIZE."""
+    author_ids = list(author_ids)
+    user_ids = set()
+    for start in range(0, len(author_ids), TRIM_BATCH_SIZE):
+        user_ids.update(Follow.objects.filter(
+            author__in=author_ids[start:start + TRIM_BATCH_SIZE]
+        ).values_list('user_id', flat=True))
+    user_ids = sorted(user_ids)
+    rows = 0
+    for start in range(0, len(user_ids), TRIM_BATCH_SIZE):
+        batch = user_ids[start:start + TRIM_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        with transaction.atomic(), connection.cursor() as cursor:
+            TimelineEntry.objects.filter(user__in=batch).delete()
+            rows += _fill(cursor, f'AND f.user_id IN ({placeholders})',
+                          batch)
+        bump_follow_versions([f'user:{user_id}' for user_id in batch])
+    return rows
+
+
+def follow_queryset(user):
+    """Посты ленты подписок и поле, по которому ее листать."""
+    direct_authors = direct_read_authors(user)
+    if not direct_authors.exists():
+        posts = Post.objects.filter(timeline_entries__user=user)
+        return posts, '-timeline_entries__pub_date'
+    posts = Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=direct_authors)
+    )
+    return posts, '-pub_date'
+
+
+def follow_count_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def follow_feed(request, unread=False):
+    """Страница ленты подписок текущего пользователя."""
+    if not unread:
+        trim_overflow(request.user.pk)
+    posts, ordering = follow_queryset(request.user)
+    return paginate(request, posts.with_related(), ordering=ordering,
+                    count_scope=follow_count_scope(request.user.pk),
+                    unread=unread)
+
+
+def follow_cache_key(request):
+    """Ключ кеша разметки страницы ленты подписок или None, если
+    страницу не кешируем: по курсору или дальше FOLLOW_CACHED_PAGES."""
+    page = request.GET.get('page', '1')
+    if (request.GET.get('after') or request.GET.get('before')
+            or not page.isdigit()
+            or not 1 <= int(page) <= settings.FOLLOW_CACHED_PAGES):
+        return None
+    user_id = request.user.pk
+    direct_authors = Follow.objects.filter(
+        user=user_id,
+        author__counters__followers_count__gt=(
+            settings.FOLLOW_CACHE_INVALIDATION_LIMIT
+        )
+    ).order_by('author').values_list('author', flat=True)
+    scopes = ['all', f'user:{user_id}',
+              *(f'author:{author_id}' for author_id in direct_authors)]
+    # Популярных авторов в подписках может быть много, а длина ключа
+    # у memcached ограничена.
+    versions = ':'.join(map(str, follow_versions(scopes)))
+    digest = hashlib.md5(versions.encode()).hexdigest()
+    return f'posts:follow_page:{user_id}:{page}:{digest}'
+
+
+def invalidate_follow_caches(author_id):
+    """Сбрасывает кеш лент подписчиков автора после его поста."""
+    limit = settings.FOLLOW_CACHE_INVALIDATION_LIMIT
+    # Вызывается и при каскадном удалении автора: строку счетчиков
+    # читаем без user_counters(), чтобы не создавать ее заново.
+    followers_count = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first() or 0
+    if followers_count > limit:
+        bump_follow_versions([f'author:{author_id}'])
+        return
+    followers = Follow.objects.filter(
+        author=author_id
+    ).values_list('user', flat=True)[:limit]
+    bump_follow_versions([f'user:{user_id}' for user_id in followers])
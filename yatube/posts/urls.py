@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, syndication, views
 
 app_name = 'posts'
 
@@ -9,9 +9,11 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -23,4 +25,20 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow"
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail,
+         name='api_post_detail'),
+    path('api/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/profile/<str:username>/posts/', api.profile,
+         name='api_profile'),
+    path('group/<slug:slug>/rss/', syndication.group_rss,
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', syndication.group_atom,
+         name='group_atom'),
+    path('profile/<str:username>/rss/', syndication.author_rss,
+         name='author_rss'),
+    path('profile/<str:username>/atom/', syndication.author_atom,
+         name='author_atom'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
 ]
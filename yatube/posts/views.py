@@ -1,54 +1,134 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
-
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-
-
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .caching import index_cache_key
+from .conditional import (feed_etag, feed_last_modified, post_etag,
+                          post_last_modified, profile_etag, public_etag)
+from .counters import user_counters
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator, decode_cursor, paginate
+from .search import search_posts
+from .thumbnails import pregenerate
+from .timeline import follow_cache_key, follow_feed
+
+
+def cached_feed_page(request, cache_key, get_page):
+    """Страница ленты и ее разметка: из кеша по cache_key, если она
+    там есть, — тогда get_page(unread=True) не читает посты из базы."""
+    content = cache.get(cache_key) if cache_key else None
+    page_obj = get_page(unread=content is not None)
+    if content is None:
+        content = render_to_string('posts/includes/feed_page.html',
+                                   {'page_obj': page_obj}, request)
+        if cache_key:
+            cache.set(cache_key, content, settings.FEED_CACHE_TIMEOUT)
+    return {'page_obj': page_obj, 'feed_page': content}
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    posts = Post.objects.with_related()
+    context = cached_feed_page(
+        request, index_cache_key(request),
+        lambda unread: paginate(request, posts, count_scope='index',
+                                unread=unread)
+    )
     return render(request, 'posts/index.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=public_etag, last_modified_func=feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.with_related()
+    page_obj = paginate(request, posts, count_scope=f'group:{group.pk}')
     context = {'group': group, 'page_obj': page_obj}
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=profile_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = author.posts.with_related()
+    page_obj = paginate(request, posts, count_scope=f'author:{author.pk}')
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
     ).exists()
-    context = {'page_obj': page_obj, 'author': author, 'following': following}
+    context = {
+        'page_obj': page_obj,
+        'author': author,
+        'following': following,
+        'counters': user_counters(author.pk),
+    }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(request, post_id, first_page_size=None):
+    """Порция комментариев поста по курсору ?after= в порядке создания."""
+    comments = Comment.objects.with_related().filter(post=post_id)
+    cursor = request.GET.get('after')
+    per_page = settings.COMMENTS_PER_PAGE
+    if decode_cursor(cursor) is None and first_page_size:
+        per_page = first_page_size
+    paginator = CursorPaginator(comments, per_page, ordering='created')
+    return paginator.cursor_page(cursor) or paginator.first_page()
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.with_related(), pk=post_id)
     form = CommentForm()
-    context = {'post': post, 'comments': comments, 'form': form}
+    context = {
+        'post': post,
+        'comments': comments_page(request, post_id,
+                                  settings.COMMENTS_FIRST_PAGE),
+        'form': form,
+        'posts_count': user_counters(post.author_id).posts_count,
+    }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments(request, post_id):
+    """Фрагмент со следующей порцией комментариев для «Показать еще»."""
+    get_object_or_404(Post, pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    results = next_query = None
+    if form.is_valid():
+        results = search_posts(
+            form.cleaned_data['q'],
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+            cursor=request.GET.get('after'),
+        )
+        if results.next_cursor:
+            params = request.GET.copy()
+            params['after'] = results.next_cursor
+            next_query = params.urlencode()
+    context = {'form': form, 'results': results, 'next_query': next_query}
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if not form.is_valid():
@@ -56,10 +136,12 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    pregenerate(post)
     return redirect('posts:profile', username=request.user.username)
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -73,10 +155,13 @@ def post_edit(request, post_id):
         return render(request, 'posts/create_post.html', {'form': form,
                                                           'post': post})
     form.save()
+    if 'image' in form.changed_data:
+        pregenerate(post)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -90,33 +175,31 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    context = cached_feed_page(
+        request, follow_cache_key(request),
+        lambda unread: follow_feed(request, unread=unread)
+    )
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    object = Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if author != request.user and not object:
-        Follow.objects.create(user=request.user, author=author)
+    if author != request.user:
+        # Повторную подписку отклоняет ограничение unique_follow,
+        # поэтому гонка двух запросов не создаст дубль.
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    object = Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if author != request.user and object:
-        Follow.objects.filter(user=request.user, author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,9 +64,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Реплика для чтения GET-запросов (core/routers.py): копия базы,
+# которую ведет репликация, или тот же файл — в режиме WAL читатели
+# не ждут писателя. Открывается только на чтение
+REPLICA_DB_PATH = os.environ.get('REPLICA_DB_PATH', '')
+if REPLICA_DB_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{REPLICA_DB_PATH}?mode=ro',
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после POST пользователь читает из основной базы
+REPLICA_PIN_SECONDS = 10
+
+# PRAGMA для каждого соединения SQLite (core/sqlite.py):
+# cache_size в КиБ, если отрицательный
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,14 +136,93 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
 
+# Комментарии на странице поста и в каждой догружаемой порции
+COMMENTS_FIRST_PAGE = 20
+COMMENTS_PER_PAGE = 50
+
+# Наибольший ?limit= для JSON API
+API_MAX_PAGE_SIZE = 1000
+
+# RSS/Atom-ленты групп и авторов: число записей и сколько секунд
+# клиенты и прокси могут не перепроверять ленту
+SYNDICATION_ITEMS = 20
+SYNDICATION_MAX_AGE = 5 * 60
+
+# Доля запросов, для которых собираются метрики (core/metrics.py);
+# 0 — не собирать. /metrics/ открыт сотрудникам и по токену
+METRICS_SAMPLE_RATE = 1.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Запросы дольше порога (в секундах) пишутся в журнал с планом
+# выполнения (core/slowlog.py); None — не писать
+SLOW_QUERY_THRESHOLD = 0.2
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.jsonl')
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки крупнее этого размера пишутся на диск кусками,
+# а не собираются в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
+# Ограничения и перекодирование картинок постов, см. posts/images.py
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIZE = (2048, 2048)
+POST_IMAGE_QUALITY = 85
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# При нескольких WSGI-процессах на одном хосте кеш должен быть общим,
+# иначе сброс версии ленты не дойдет до остальных процессов:
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'core.cache.SQLiteCache',
+#         'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+#         'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+#     }
+# }
+
+# Длина материализованной ленты подписок одного пользователя
+TIMELINE_LENGTH = 1000
+
+# Посты авторов с большим числом подписчиков не раскладываются
+# по лентам при публикации, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Фрагменты лент сбрасываются по версии (posts.caching),
+# поэтому время жизни может быть большим
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Сколько первых страниц ленты подписок кешируется для каждого
+# пользователя и сколько подписчиков автора может сбросить один пост;
+# у авторов с большим числом подписчиков своя версия кеша
+FOLLOW_CACHED_PAGES = 3
+FOLLOW_CACHE_INVALIDATION_LIMIT = 1000
+
+# Профили адаптивных картинок постов: ширины для srcset, форматы
+# в порядке предпочтения (последний — запасной для <img>) и атрибут
+# sizes под сетку страницы. Все миниатюры профилей строятся заранее
+POST_THUMBNAIL_PROFILES = {
+    'feed': {
+        'size': (960, 339),
+        'widths': (320, 640, 960),
+        'formats': ('WEBP', 'JPEG'),
+        'sizes': '(min-width: 992px) 960px, 100vw',
+        'options': {'crop': 'center', 'upscale': True},
+    },
+    'detail': {
+        'size': (960, 339),
+        'widths': (320, 640, 960),
+        'formats': ('WEBP', 'JPEG'),
+        'sizes': '(min-width: 768px) 75vw, 100vw',
+        'options': {'crop': 'center', 'upscale': True},
+    },
+}